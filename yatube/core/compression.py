@@ -0,0 +1,73 @@
+"""Сжатие ответов и статики gzip и, если установлен пакет brotli, Brotli."""
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP, BROTLI = 'gzip', 'br'
+# Расширения заранее сжатых копий статики, от предпочтительной
+SUFFIXES = {BROTLI: '.br', GZIP: '.gz'}
+
+
+def available_encodings():
+    """Кодировки, которые умеем сжимать, от предпочтительной."""
+    return (BROTLI, GZIP) if brotli is not None else (GZIP,)
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding с ненулевым q."""
+    accepted = set()
+    for item in header.split(','):
+        name, *params = [part.strip() for part in item.split(';')]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name and quality > 0:
+            accepted.add(name.lower())
+    return accepted
+
+
+def choose_encoding(header, encodings=None):
+    """Лучшая из encodings, которую принимает клиент, или None."""
+    if encodings is None:
+        encodings = available_encodings()
+    accepted = accepted_encodings(header)
+    for encoding in encodings:
+        if encoding in accepted or '*' in accepted:
+            return encoding
+    return None
+
+
+def compress(data, encoding, best=False):
+    """Сжимает байты; best — максимальный уровень для статики."""
+    if encoding == BROTLI:
+        return brotli.compress(data, quality=11 if best else 5)
+    # mtime=0 — одинаковый файл при каждом collectstatic
+    return gzip.compress(data, compresslevel=9 if best else 6, mtime=0)
+
+
+def compress_stream(chunks, encoding):
+    """Сжимает поток, отдавая сжатые данные после каждого куска."""
+    if encoding == BROTLI:
+        compressor = brotli.Compressor(quality=5)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        # Z_SYNC_FLUSH — клиент получает начало страницы, не дожидаясь конца
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
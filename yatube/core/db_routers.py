@@ -0,0 +1,105 @@
+"""Чтение из реплик для view, которым не важна свежесть на доли секунды.
+
+View, обёрнутые read_from_replicas, читают из случайной базы
+DATABASE_REPLICAS. Запись всегда идёт в default. После записи
+(view, обёрнутые pin_to_primary) пользователь REPLICA_MAX_LAG_SECONDS
+секунд читает только из default, чтобы сразу увидеть своё изменение.
+"""
+import random
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core import signing
+from django.utils.cache import patch_cache_control
+
+PIN_COOKIE = 'primary_pin'
+PIN_SALT = 'core.db_routers.pin'
+
+_state = threading.local()
+
+
+@contextmanager
+def replica_reads():
+    """Внутри блока чтения текущего потока уходят в реплики."""
+    previous = getattr(_state, 'enabled', False)
+    _state.enabled = True
+    try:
+        yield
+    finally:
+        _state.enabled = previous
+
+
+def is_pinned(request):
+    try:
+        request.get_signed_cookie(
+            PIN_COOKIE, salt=PIN_SALT,
+            max_age=settings.REPLICA_MAX_LAG_SECONDS
+        )
+    except (KeyError, signing.BadSignature):
+        return False
+    return True
+
+
+def read_from_replicas(view):
+    """GET-запросы view читают из реплик, если пользователь не закреплён.
+
+    Ответ, собранный по реплике, получает max-age не больше допустимого
+    отставания — столько его продержит и cache_page.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (
+            not settings.DATABASE_REPLICAS
+            or request.method not in ('GET', 'HEAD')
+            or is_pinned(request)
+        ):
+            return view(request, *args, **kwargs)
+        with replica_reads():
+            response = view(request, *args, **kwargs)
+        patch_cache_control(
+            response, max_age=settings.REPLICA_MAX_LAG_SECONDS
+        )
+        return response
+    return wrapper
+
+
+def pin_to_primary(view):
+    """После view пользователь какое-то время читает только из default."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if settings.DATABASE_REPLICAS:
+            response.set_signed_cookie(
+                PIN_COOKIE, '1', salt=PIN_SALT,
+                max_age=settings.REPLICA_MAX_LAG_SECONDS, httponly=True
+            )
+        return response
+    return wrapper
+
+
+class ReplicaRouter:
+    # Сессии и хранилище миниатюр читаются сразу после записи, а
+    # отставание реплики разлогинило бы пользователя или заставило
+    # заново строить миниатюры
+    primary_apps = {'sessions', 'thumbnail'}
+
+    def db_for_read(self, model, **hints):
+        if (
+            settings.DATABASE_REPLICAS
+            and getattr(_state, 'enabled', False)
+            and model._meta.app_label not in self.primary_apps
+        ):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Во всех базах одни и те же данные
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
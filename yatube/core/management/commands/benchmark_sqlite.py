@@ -0,0 +1,157 @@
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.sqlite import (
+    PRODUCTION_PRAGMAS, PRODUCTION_TIMEOUT, apply_pragmas
+)
+
+SCHEMA = (
+    'CREATE TABLE post ('
+    'id INTEGER PRIMARY KEY AUTOINCREMENT, text TEXT NOT NULL, '
+    'pub_date TEXT NOT NULL, author_id INTEGER NOT NULL)',
+    'CREATE INDEX post_pub_date_idx ON post (pub_date DESC)',
+)
+READ = (
+    'SELECT id, text, pub_date, author_id FROM post '
+    'ORDER BY pub_date DESC LIMIT 10'
+)
+WRITE = 'INSERT INTO post (text, pub_date, author_id) VALUES (?, ?, ?)'
+
+PROFILES = {
+    # Как у Django по умолчанию: соединение на запрос, журнал DELETE
+    'default': {'pragmas': {}, 'persistent': False, 'timeout': 5},
+    'production': {
+        'pragmas': PRODUCTION_PRAGMAS,
+        'persistent': True,
+        'timeout': PRODUCTION_TIMEOUT,
+    },
+}
+
+
+class Worker(threading.Thread):
+    """Поток, который до дедлайна выполняет одну операцию по кругу."""
+
+    def __init__(self, path, profile, sql, deadline):
+        super().__init__()
+        self.path = path
+        self.profile = profile
+        self.sql = sql
+        self.deadline = deadline
+        self.latencies = []
+        self.errors = 0
+        self.db = None
+
+    def connect(self):
+        db = sqlite3.connect(
+            self.path, timeout=self.profile['timeout'], isolation_level=None
+        )
+        apply_pragmas(db, self.profile['pragmas'])
+        return db
+
+    def operation(self, db):
+        if self.sql == WRITE:
+            db.execute(WRITE, ('новый пост', time.time(), 1))
+        else:
+            db.execute(READ).fetchall()
+
+    def run(self):
+        while time.perf_counter() < self.deadline:
+            started = time.perf_counter()
+            try:
+                if self.db is None:
+                    db = self.connect()
+                    if self.profile['persistent']:
+                        self.db = db
+                else:
+                    db = self.db
+                self.operation(db)
+                if not self.profile['persistent']:
+                    db.close()
+            except sqlite3.OperationalError:
+                self.errors += 1
+                continue
+            self.latencies.append((time.perf_counter() - started) * 1000)
+        if self.db is not None:
+            self.db.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность SQLite при параллельных '
+        'чтениях и записях: настройки по умолчанию и settings_production'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=3)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument(
+            '--rows', type=int, default=10000,
+            help='Сколько постов в базе перед замером'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"профиль":<12}{"чтений/с":>10}{"записей/с":>11}'
+            f'{"чтение p95":>12}{"запись p95":>12}{"ошибок":>8}'
+        )
+        for name, profile in PROFILES.items():
+            directory = tempfile.mkdtemp()
+            try:
+                self.measure(
+                    name, profile, os.path.join(directory, 'bench.sqlite3'),
+                    options
+                )
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    def measure(self, name, profile, path, options):
+        db = sqlite3.connect(path, isolation_level=None)
+        apply_pragmas(db, profile['pragmas'])
+        for statement in SCHEMA:
+            db.execute(statement)
+        db.execute('BEGIN')
+        db.executemany(WRITE, (
+            (f'пост {number}', number, 1) for number in range(options['rows'])
+        ))
+        db.execute('COMMIT')
+        db.close()
+        deadline = time.perf_counter() + options['seconds']
+        workers = [
+            Worker(path, profile, READ, deadline)
+            for _ in range(options['readers'])
+        ] + [
+            Worker(path, profile, WRITE, deadline)
+            for _ in range(options['writers'])
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        reads = [
+            latency for worker in workers if worker.sql == READ
+            for latency in worker.latencies
+        ]
+        writes = [
+            latency for worker in workers if worker.sql == WRITE
+            for latency in worker.latencies
+        ]
+        self.stdout.write(
+            f'{name:<12}{len(reads) / options["seconds"]:>10.0f}'
+            f'{len(writes) / options["seconds"]:>11.0f}'
+            f'{self.p95(reads):>12.2f}{self.p95(writes):>12.2f}'
+            f'{sum(worker.errors for worker in workers):>8}'
+        )
+
+    @staticmethod
+    def p95(values):
+        if len(values) < 2:
+            return values[0] if values else 0.0
+        return statistics.quantiles(values, n=20)[-1]
@@ -0,0 +1,32 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файлы реплик — для локальной '
+        'проверки чтения из реплик'
+    )
+
+    def handle(self, *args, **options):
+        primary = connections['default']
+        if primary.vendor != 'sqlite':
+            raise CommandError(
+                'Команда работает только с SQLite: другие СУБД наполняют '
+                'реплики своей репликацией'
+            )
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не заданы: DATABASE_REPLICAS пуст')
+        primary.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            connections[alias].close()
+            target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            if options['verbosity']:
+                self.stdout.write(f'{alias}: скопирована')
@@ -0,0 +1,109 @@
+"""Сбор времени ответа, запросов к БД и рендера шаблонов по view.
+
+Замеры хранятся в памяти процесса: для каждого view и метрики —
+последние REQUEST_METRICS_WINDOW значений.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+
+METRICS = ('total_ms', 'db_ms', 'template_ms', 'queries')
+BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_local = threading.local()
+_lock = threading.Lock()
+_samples = {}
+
+
+class Timer:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.queries = 0
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_ms += (time.perf_counter() - started) * 1000
+            self.queries += 1
+
+    def result(self):
+        return {
+            'total_ms': (time.perf_counter() - self.started) * 1000,
+            'db_ms': self.db_ms,
+            'template_ms': self.template_ms,
+            'queries': self.queries,
+        }
+
+
+def start():
+    _local.timer = Timer()
+    return _local.timer
+
+
+def stop():
+    _local.timer = None
+
+
+def add_template_time(ms):
+    timer = getattr(_local, 'timer', None)
+    if timer is not None:
+        timer.template_ms += ms
+
+
+def record(view_name, result):
+    with _lock:
+        if view_name not in _samples:
+            _samples[view_name] = defaultdict(
+                lambda: deque(maxlen=settings.REQUEST_METRICS_WINDOW)
+            )
+        for metric in METRICS:
+            _samples[view_name][metric].append(result[metric])
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+
+
+def _percentile(values, share):
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+def _histogram(values):
+    counts = dict.fromkeys([str(bucket) for bucket in BUCKETS] + ['+Inf'], 0)
+    for value in values:
+        bucket = next(
+            (str(bucket) for bucket in BUCKETS if value <= bucket), '+Inf'
+        )
+        counts[bucket] += 1
+    return counts
+
+
+def snapshot():
+    """Сводка по каждому view: count, p50, p95, max и гистограмма."""
+    with _lock:
+        copied = {
+            view: {metric: sorted(values) for metric, values in data.items()}
+            for view, data in _samples.items()
+        }
+    return {
+        view: {
+            metric: {
+                'count': len(values),
+                'p50': _percentile(values, 0.5),
+                'p95': _percentile(values, 0.95),
+                'max': values[-1],
+                'histogram': _histogram(values),
+            }
+            for metric, values in data.items() if values
+        }
+        for view, data in copied.items()
+    }
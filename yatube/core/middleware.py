@@ -0,0 +1,85 @@
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from . import metrics
+from .compression import choose_encoding, compress, compress_stream
+
+
+class RequestMetricsMiddleware:
+    """Замеряет запрос и отдаёт итог в заголовке Server-Timing."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = metrics.start()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timer.db_wrapper)
+                    )
+                response = self.get_response(request)
+        finally:
+            metrics.stop()
+        result = timer.result()
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else '<unresolved>'
+        metrics.record(view_name, result)
+        response['Server-Timing'] = (
+            f'db;dur={result["db_ms"]:.1f};'
+            f'desc="{result["queries"]} queries", '
+            f'tpl;dur={result["template_ms"]:.1f}, '
+            f'total;dur={result["total_ms"]:.1f}'
+        )
+        return response
+
+
+class CompressionMiddleware:
+    """Сжимает HTML, JSON и другие текстовые ответы gzip или Brotli.
+
+    Обычные ответы короче COMPRESS_MIN_SIZE байт не сжимаются, потоковые
+    сжимаются кусками по мере отдачи.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        content_type = response.get('Content-Type', '').split(';')[0]
+        if (
+            response.has_header('Content-Encoding')
+            or content_type not in settings.COMPRESS_CONTENT_TYPES
+            or not response.streaming
+            and len(response.content) < settings.COMPRESS_MIN_SIZE
+        ):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if encoding is None:
+            return response
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding
+            )
+            del response['Content-Length']
+        else:
+            content = compress(response.content, encoding)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+        # Сжатое тело уже не совпадает побайтно с исходным, поэтому
+        # сильный ETag становится слабым (RFC 7232, 2.1); If-None-Match
+        # сравнивает слабо, и 304 по-прежнему работают
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
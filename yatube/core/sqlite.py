@@ -0,0 +1,32 @@
+"""PRAGMA для новых соединений с SQLite из settings.SQLITE_PRAGMAS.
+
+Здесь же значения профиля yatube.settings_production: их берёт и
+benchmark_sqlite, не импортируя сам профиль.
+"""
+from django.conf import settings
+
+# Соединение живёт столько секунд вместо одного запроса
+PRODUCTION_CONN_MAX_AGE = 600
+# Сколько секунд ждать снятия блокировки записи
+PRODUCTION_TIMEOUT = 20
+PRODUCTION_PRAGMAS = {
+    # Читатели не блокируют писателя и наоборот
+    'journal_mode': 'wal',
+    # В WAL fsync на каждом коммите не нужен для целостности базы
+    'synchronous': 'normal',
+    # Кеш страниц в КиБ (отрицательное значение) на соединение
+    'cache_size': -64000,
+    'mmap_size': 256 * 2 ** 20,
+    'temp_store': 'memory',
+}
+
+
+def apply_pragmas(db, pragmas):
+    """Выполняет PRAGMA на соединении sqlite3."""
+    for name, value in pragmas.items():
+        db.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite' and settings.SQLITE_PRAGMAS:
+        apply_pragmas(connection.connection, settings.SQLITE_PRAGMAS)
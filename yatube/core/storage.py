@@ -0,0 +1,49 @@
+"""Хранилище статики: хешированные имена и заранее сжатые копии."""
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+from .compression import SUFFIXES, available_encodings, compress
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """После collectstatic рядом с каждым хешированным текстовым файлом
+    кладёт name.gz и name.br, если они меньше оригинала.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed_names = {}
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            yield name, hashed_name, processed
+            if hashed_name and not isinstance(processed, Exception):
+                # CSS переписывается за несколько проходов: сжимаем
+                # только окончательную версию
+                hashed_names[name] = hashed_name
+        if dry_run:
+            return
+        for name, hashed_name in hashed_names.items():
+            for variant in self.compress_file(hashed_name):
+                yield name, variant, True
+
+    def compress_file(self, name):
+        """Пишет сжатые копии name; возвращает их имена."""
+        extension = os.path.splitext(name)[1].lower()
+        if extension not in settings.STATIC_COMPRESS_EXTENSIONS:
+            return []
+        with self.open(name) as source:
+            data = source.read()
+        variants = []
+        for encoding in available_encodings():
+            content = compress(data, encoding, best=True)
+            variant = name + SUFFIXES[encoding]
+            if self.exists(variant):
+                self.delete(variant)
+            if len(content) >= len(data):
+                continue
+            self.save(variant, ContentFile(content))
+            variants.append(variant)
+        return variants
@@ -0,0 +1,30 @@
+import time
+
+from django.template.backends.django import DjangoTemplates
+
+from . import metrics
+
+
+class TimedTemplate:
+    """Обёртка шаблона, добавляющая время рендера в метрики запроса."""
+
+    def __init__(self, template):
+        self._wrapped = template
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return self._wrapped.render(context, request)
+        finally:
+            metrics.add_template_time((time.perf_counter() - started) * 1000)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
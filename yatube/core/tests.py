@@ -0,0 +1,320 @@
+import gzip
+import importlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from http import HTTPStatus
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.test import (
+    Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+)
+from django.urls import reverse
+
+from . import metrics
+from .compression import accepted_encodings, choose_encoding
+from .db_routers import PIN_COOKIE, ReplicaRouter, replica_reads
+from .middleware import CompressionMiddleware
+from .views import serve_static
+
+User = get_user_model()
+
+
+class RequestMetricsTest(TestCase):
+    def setUp(self):
+        self.guest_client = Client()
+        self.staff_client = Client()
+        self.staff_client.force_login(
+            User.objects.create_user(username='staff', is_staff=True)
+        )
+        metrics.reset()
+        cache.clear()
+
+    def test_server_timing_header(self):
+        """Ответ содержит Server-Timing с БД, шаблонами и общим временем."""
+        response = self.guest_client.get(reverse('posts:index'))
+        header = response['Server-Timing']
+        for part in ('db;dur=', 'queries', 'tpl;dur=', 'total;dur='):
+            with self.subTest(part=part):
+                self.assertIn(part, header)
+
+    def test_metrics_are_aggregated_per_view(self):
+        """Замеры копятся по имени view и видны сотрудникам."""
+        for _ in range(3):
+            cache.clear()
+            self.guest_client.get(reverse('posts:index'))
+        response = self.staff_client.get(reverse('core:request_metrics'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        index = response.json()['posts:index']
+        self.assertEqual(index['queries']['count'], 3)
+        self.assertGreater(index['queries']['p50'], 0)
+        self.assertGreater(index['template_ms']['max'], 0)
+        self.assertEqual(sum(index['total_ms']['histogram'].values()), 3)
+
+    def test_metrics_are_staff_only(self):
+        """Обычный посетитель не видит метрики."""
+        response = self.guest_client.get(reverse('core:request_metrics'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+
+# Две базы SQLite в отдельном процессе: реплика отстаёт от основной,
+# пока её не обновит sync_replicas
+REPLICA_SCENARIO = """
+import django
+django.setup()
+from django.core.management import call_command
+from django.test import Client
+from django.test.utils import setup_test_environment
+from posts.models import Post, User
+
+setup_test_environment()
+call_command('migrate', verbosity=0)
+writer = User.objects.create_user(username='writer')
+call_command('sync_replicas', verbosity=0)
+Post.objects.create(text='только в основной', author=writer)
+
+guest, author = Client(), Client()
+author.force_login(writer)
+assert 'только в основной' not in guest.get('/').content.decode()
+assert 'только в основной' not in author.get('/').content.decode()
+
+response = author.post('/create/', {'text': 'своя запись'})
+assert response.cookies['primary_pin'].value
+for url in ('/', '/profile/writer/', '/follow/'):
+    assert author.get(url).status_code == 200, url
+page = author.get('/').content.decode()
+assert 'своя запись' in page and 'только в основной' in page
+assert 'своя запись' not in guest.get('/').content.decode()
+
+call_command('sync_replicas', verbosity=0)
+assert 'своя запись' in Client().get('/profile/writer/').content.decode()
+"""
+
+
+class ReplicaRouterTest(SimpleTestCase):
+    @override_settings(DATABASE_REPLICAS=['replica_1', 'replica_2'])
+    def test_reads_go_to_replicas_only_inside_block(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(User), 'default')
+        with replica_reads():
+            self.assertIn(
+                router.db_for_read(User), ('replica_1', 'replica_2')
+            )
+            self.assertEqual(router.db_for_read(Session), 'default')
+            self.assertEqual(router.db_for_write(User), 'default')
+        self.assertEqual(router.db_for_read(User), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas_configured(self):
+        with replica_reads():
+            self.assertEqual(ReplicaRouter().db_for_read(User), 'default')
+
+
+class ReplicaPinningTest(TestCase):
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_pin_cookie_without_replicas(self):
+        client = Client()
+        client.force_login(User.objects.create_user(username='writer'))
+        response = client.post(reverse('posts:post_create'), {'text': 'x'})
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=['missing_replica'])
+    def test_login_and_signup_pin_to_primary(self):
+        """После входа и регистрации чтения не уходят в реплику.
+
+        Базы missing_replica нет: обращение к ней уронило бы запрос.
+        """
+        client = Client()
+        response = client.post(reverse('users:signup'), {
+            'username': 'newcomer',
+            'password1': 'Sup3r-secret-pass',
+            'password2': 'Sup3r-secret-pass',
+        })
+        self.assertRedirects(response, reverse('posts:index'))
+        self.assertIn(PIN_COOKIE, response.cookies)
+        response = client.post(reverse('users:login'), {
+            'username': 'newcomer', 'password': 'Sup3r-secret-pass',
+        })
+        self.assertIn(PIN_COOKIE, response.cookies)
+        profile = client.get(reverse('posts:profile', args=('newcomer',)))
+        self.assertEqual(profile.context['user'].username, 'newcomer')
+        response = client.get(reverse('users:logout'))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_two_sqlite_files(self):
+        """Чтения идут в отстающую реплику, кроме как у только что писавших."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        env = dict(
+            os.environ,
+            DATABASE_PATH=os.path.join(directory, 'primary.sqlite3'),
+            DATABASE_REPLICAS=os.path.join(directory, 'replica.sqlite3'),
+            DJANGO_SETTINGS_MODULE='yatube.settings',
+        )
+        subprocess.run(
+            [sys.executable, '-c', REPLICA_SCENARIO],
+            cwd=settings.BASE_DIR, env=env, check=True
+        )
+
+
+class SqlitePragmasTest(SimpleTestCase):
+    @override_settings(SQLITE_PRAGMAS={
+        'journal_mode': 'wal', 'synchronous': 'normal', 'cache_size': -2000
+    })
+    def test_pragmas_applied_on_new_connection(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        wrapper = DatabaseWrapper(
+            dict(
+                connection.settings_dict,
+                NAME=os.path.join(directory, 'pragmas.sqlite3')
+            ),
+            alias='pragmas'
+        )
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            for pragma, expected in (
+                ('journal_mode', 'wal'), ('synchronous', 1),
+                ('cache_size', -2000)
+            ):
+                cursor.execute(f'PRAGMA {pragma}')
+                with self.subTest(pragma=pragma):
+                    self.assertEqual(cursor.fetchone()[0], expected)
+
+    def test_benchmark_compares_profiles(self):
+        out = StringIO()
+        call_command(
+            'benchmark_sqlite', seconds=0.2, rows=100, readers=1, writers=1,
+            stdout=out
+        )
+        for profile in ('default', 'production'):
+            with self.subTest(profile=profile):
+                self.assertIn(profile, out.getvalue())
+
+    def test_production_profile_keeps_base_settings(self):
+        """Импорт settings_production не меняет DATABASES этого процесса."""
+        from yatube import settings as base
+        from yatube import settings_production
+
+        before = repr(base.DATABASES)
+        importlib.reload(settings_production)
+        self.assertEqual(repr(base.DATABASES), before)
+        self.assertEqual(settings.DATABASES['default']['CONN_MAX_AGE'], 0)
+        self.assertEqual(
+            settings_production.DATABASES['default']['CONN_MAX_AGE'], 600
+        )
+
+
+class CompressionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def compressed(self, response, header='gzip'):
+        middleware = CompressionMiddleware(lambda request: response)
+        return middleware(self.factory.get('/', HTTP_ACCEPT_ENCODING=header))
+
+    def test_accept_encoding(self):
+        self.assertEqual(
+            accepted_encodings('gzip;q=1.0, br;q=0, identity'),
+            {'gzip', 'identity'}
+        )
+        self.assertEqual(choose_encoding('deflate, gzip'), 'gzip')
+        self.assertIsNone(choose_encoding('gzip;q=0'))
+        self.assertIsNone(choose_encoding('gzip', []))
+
+    def test_html_page_is_compressed(self):
+        response = self.client.get(
+            reverse('posts:index'), HTTP_ACCEPT_ENCODING='gzip, deflate'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertIn(b'</html>', gzip.decompress(response.content))
+        plain = self.client.get(reverse('posts:index'))
+        self.assertFalse(plain.has_header('Content-Encoding'))
+
+    def test_small_and_binary_responses_are_not_compressed(self):
+        small = self.compressed(HttpResponse('коротко'))
+        self.assertFalse(small.has_header('Content-Encoding'))
+        binary = self.compressed(
+            HttpResponse(b'0' * 4096, content_type='image/png')
+        )
+        self.assertFalse(binary.has_header('Content-Encoding'))
+
+    def test_streaming_response(self):
+        chunks = [b'<p>' + b'x' * 500 + b'</p>' for _ in range(10)]
+        response = self.compressed(StreamingHttpResponse(iter(chunks)))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)),
+            b''.join(chunks)
+        )
+
+    def test_strong_etag_becomes_weak(self):
+        response = HttpResponse('x' * 2048)
+        response['ETag'] = '"abc"'
+        self.assertEqual(self.compressed(response)['ETag'], 'W/"abc"')
+
+
+class CompressedStaticTest(SimpleTestCase):
+    def setUp(self):
+        source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        os.makedirs(os.path.join(source, 'css'))
+        with open(os.path.join(source, 'css', 'site.css'), 'w') as css:
+            css.write('body { margin: 0; }\n' * 200)
+        with open(os.path.join(source, 'logo.png'), 'wb') as png:
+            png.write(b'\x89PNG' + os.urandom(64))
+        settings_override = override_settings(
+            STATICFILES_DIRS=[source], STATIC_ROOT=self.root,
+            STATICFILES_STORAGE=(
+                'core.storage.CompressedManifestStaticFilesStorage'
+            )
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.factory = RequestFactory()
+
+    def hashed(self, name):
+        return staticfiles_storage.stored_name(name)
+
+    def test_collectstatic_writes_compressed_copies(self):
+        css = os.path.join(self.root, self.hashed('css/site.css'))
+        with open(css + '.gz', 'rb') as compressed, open(css, 'rb') as plain:
+            self.assertEqual(gzip.decompress(compressed.read()), plain.read())
+        png = os.path.join(self.root, self.hashed('logo.png'))
+        self.assertFalse(os.path.exists(png + '.gz'))
+
+    def test_serve_precompressed_with_far_future_cache(self):
+        name = self.hashed('css/site.css')
+        response = serve_static(
+            self.factory.get('/', HTTP_ACCEPT_ENCODING='gzip'), name
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        response.close()
+        original = serve_static(self.factory.get('/'), 'css/site.css')
+        self.assertFalse(original.has_header('Content-Encoding'))
+        self.assertIn('no-cache', original['Cache-Control'])
+        original.close()
+
+    def test_serve_rejects_paths_outside_root(self):
+        with self.assertRaises(Http404):
+            serve_static(self.factory.get('/'), '../etc/passwd')
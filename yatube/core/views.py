@@ -1,4 +1,22 @@
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse, Http404, HttpResponseNotModified, JsonResponse
+)
 from django.shortcuts import render
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+from . import metrics
+from .compression import SUFFIXES, choose_encoding
 
 
 def page_not_found(request, exception):
@@ -15,3 +33,60 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def request_metrics(request):
+    """Сводка замеров RequestMetricsMiddleware для сотрудников."""
+    return JsonResponse(metrics.snapshot(), json_dumps_params={'indent': 2})
+
+
+@require_safe
+def serve_static(request, path):
+    """Отдаёт файл из STATIC_ROOT, по возможности его .br или .gz копию.
+
+    Хешированные имена из манифеста не меняют содержимого, поэтому
+    кешируются браузером на год.
+    """
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404(path)
+    if not os.path.isfile(full_path):
+        raise Http404(path)
+    stat = os.stat(full_path)
+    if not was_modified_since(
+        request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime, stat.st_size
+    ):
+        return HttpResponseNotModified()
+    content_type, _ = mimetypes.guess_type(full_path)
+    variants = [
+        encoding for encoding, suffix in SUFFIXES.items()
+        if os.path.isfile(full_path + suffix)
+    ]
+    encoding = choose_encoding(
+        request.META.get('HTTP_ACCEPT_ENCODING', ''), variants
+    )
+    if encoding:
+        response = FileResponse(
+            open(full_path + SUFFIXES[encoding], 'rb'),
+            content_type=content_type or 'application/octet-stream'
+        )
+        response['Content-Encoding'] = encoding
+    else:
+        response = FileResponse(
+            open(full_path, 'rb'),
+            content_type=content_type or 'application/octet-stream'
+        )
+    if variants:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+    if path in hashed_files.values():
+        patch_cache_control(
+            response, public=True, max_age=settings.STATIC_HASHED_MAX_AGE,
+            immutable=True
+        )
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    return response
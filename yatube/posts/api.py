@@ -0,0 +1,213 @@
+"""JSON API только для чтения: ленты, пост с комментариями, подписки.
+
+Ленты и комментарии поста листаются курсором (?cursor=).
+?fields=id,text,... сужает набор полей поста. Сильный ETag считается
+по уже прочитанным строкам до сериализации: если клиент прислал его
+в If-None-Match, ответ 304 отдаётся без сборки JSON.
+"""
+import hashlib
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers,
+    quote_etag
+)
+from django.views.decorators.http import require_safe
+
+from core.db_routers import read_from_replicas
+
+from . import write_queue
+from .models import Group, Post, User
+from .paginators import CursorPaginator, MergingCursorPaginator
+from .timeline import FEED_DATE, follow_feed
+from .utils import get_comments_page
+
+POST_FIELDS = (
+    'id', 'text', 'pub_date', 'updated', 'author', 'group', 'image',
+    'comments_count',
+)
+
+
+class ApiError(Exception):
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def api_view(view):
+    """GET/HEAD, ошибки — JSON вида {"detail": ...}, чтение из реплик."""
+    @require_safe
+    @read_from_replicas
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            error = ApiError(404, 'Не найдено')
+        except ApiError as exc:
+            error = exc
+        return JsonResponse({'detail': error.detail}, status=error.status)
+    return wrapper
+
+
+def requested_fields(request, allowed=POST_FIELDS):
+    value = request.GET.get('fields')
+    if not value:
+        return allowed
+    fields = tuple(dict.fromkeys(
+        field.strip() for field in value.split(',') if field.strip()
+    ))
+    unknown = [field for field in fields if field not in allowed]
+    if unknown or not fields:
+        raise ApiError(400, f'Неизвестные поля: {", ".join(unknown)}')
+    return fields
+
+
+def make_etag(*parts):
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def post_version(post):
+    """Всё, от чего зависит JSON поста: если совпало — совпал и ответ."""
+    return (
+        post.pk, post.updated.isoformat(), post.comments_count,
+        post.author.username, post.author.first_name,
+        post.author.last_name,
+        post.group and (post.group.slug, post.group.title),
+        post.image.name,
+    )
+
+
+def _user(user):
+    return {'username': user.username, 'full_name': user.get_full_name()}
+
+
+def serialize_post(post, fields):
+    values = {
+        'id': lambda: post.pk,
+        'text': lambda: post.text,
+        'pub_date': lambda: post.pub_date,
+        'updated': lambda: post.updated,
+        'author': lambda: _user(post.author),
+        'group': lambda: post.group and {
+            'slug': post.group.slug, 'title': post.group.title
+        },
+        'image': lambda: post.image.url if post.image else None,
+        'comments_count': lambda: post.comments_count,
+    }
+    return {field: values[field]() for field in fields if field in values}
+
+
+def not_modified(request, etag):
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['ETag'] = etag
+    return response
+
+
+def json_response(data, etag):
+    response = JsonResponse(data, json_dumps_params={'ensure_ascii': False})
+    response['ETag'] = etag
+    return response
+
+
+def page_url(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return f'{request.path}?{urlencode(sorted(query.items()))}'
+
+
+def feed_response(request, queryset, streams=None, date_field='pub_date'):
+    fields = requested_fields(request)
+    if streams:
+        paginator = MergingCursorPaginator(
+            streams, settings.P_ON_PAGE, date_field=date_field
+        )
+    else:
+        paginator = CursorPaginator(
+            queryset, settings.P_ON_PAGE, date_field=date_field
+        )
+    page = paginator.get_page(request.GET.get('cursor'))
+    etag = make_etag(
+        fields, page.next_cursor, page.previous_cursor,
+        [post_version(post) for post in page]
+    )
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    return json_response({
+        'results': [serialize_post(post, fields) for post in page],
+        'next': page_url(request, page.next_cursor),
+        'previous': page_url(request, page.previous_cursor),
+    }, etag)
+
+
+@api_view
+def post_list(request):
+    return feed_response(request, Post.objects.for_feed())
+
+
+@api_view
+def group_post_list(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, group.posts.for_feed())
+
+
+@api_view
+def user_post_list(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, author.posts.for_feed())
+
+
+@api_view
+def post_detail(request, post_id):
+    fields = requested_fields(request, POST_FIELDS + ('comments',))
+    post = get_object_or_404(Post.objects.for_feed(), pk=post_id)
+    comments = []
+    if 'comments' in fields:
+        comments = get_comments_page(request, post)
+    etag = make_etag(fields, post_version(post), [
+        (
+            comment.pk, comment.text, comment.author.username,
+            comment.author.first_name, comment.author.last_name
+        )
+        for comment in comments
+    ], getattr(comments, 'next_cursor', None))
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    data = serialize_post(post, fields)
+    if 'comments' in fields:
+        data['comments'] = [
+            {
+                'id': comment.pk,
+                'text': comment.text,
+                'created': comment.created,
+                'author': _user(comment.author),
+            }
+            for comment in comments
+        ]
+        data['comments_next'] = page_url(request, comments.next_cursor)
+    return json_response(data, etag)
+
+
+@api_view
+def follow_post_list(request):
+    if not request.user.is_authenticated:
+        raise ApiError(401, 'Нужна авторизация')
+    posts, streams = write_queue.with_pending_follows(
+        request, *follow_feed(request.user)
+    )
+    response = feed_response(request, posts, streams, FEED_DATE)
+    # Лента своя у каждого пользователя: общим кэшам её хранить нельзя
+    patch_vary_headers(response, ['Cookie'])
+    patch_cache_control(response, private=True)
+    return response
@@ -0,0 +1,34 @@
+"""bulk_create, после которого у объектов есть id и заданные даты.
+
+SQLite не возвращает id из bulk_create, а поля auto_now_add получают в
+нём текущее время вместо значений объектов. Этим пользуются очередь
+отложенной записи, импорт постов и generate_data.
+"""
+from django.db import transaction
+
+
+def bulk_create(model, objects, keep_dates=()):
+    """Вставляет objects и проставляет им id.
+
+    keep_dates — поля auto_now_add, значения которых нужно сохранить
+    как есть: они дописываются вторым запросом, bulk_update.
+    """
+    if not objects:
+        return objects
+    dates = [[getattr(obj, field) for field in keep_dates] for obj in objects]
+    with transaction.atomic():
+        # Размер INSERT выбирает Django по ограничениям базы: явный
+        # batch_size он не урезает, а SQLite не примет больше 500 строк
+        model.objects.bulk_create(objects)
+        if objects[0].pk is None:
+            # Блокировка записи SQLite держится до конца транзакции,
+            # так что последние строки таблицы — наши
+            ids = model.objects.order_by('-pk').values_list('pk', flat=True)
+            for obj, pk in zip(objects, reversed(list(ids[:len(objects)]))):
+                obj.pk = pk
+        if keep_dates:
+            for obj, values in zip(objects, dates):
+                for field, value in zip(keep_dates, values):
+                    setattr(obj, field, value)
+            model.objects.bulk_update(objects, keep_dates)
+    return objects
@@ -0,0 +1,194 @@
+import hashlib
+import time
+from calendar import timegm
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, quote_etag
+)
+from django.utils.http import http_date
+from django.views.decorators.cache import cache_page
+
+from core.db_routers import is_pinned
+
+from . import write_queue
+from .models import Group, User
+
+GENERATION_KEY = 'feed-generation:{}'
+
+
+def _initial_generation():
+    # Поколение, потерянное при вытеснении, не должно совпасть со старым.
+    return time.time_ns()
+
+
+def get_generations(scopes):
+    """Текущие номера поколений для областей кеша."""
+    keys = {GENERATION_KEY.format(scope): scope for scope in scopes}
+    found = cache.get_many(keys)
+    generations = {keys[key]: value for key, value in found.items()}
+    for key, scope in keys.items():
+        if scope not in generations:
+            cache.add(key, _initial_generation(), None)
+            generations[scope] = cache.get(key)
+    return generations
+
+
+def _bump(scopes):
+    for scope in scopes:
+        key = GENERATION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_generation(), None)
+
+
+def invalidate(*scopes):
+    """Сдвигает поколения: закешированные страницы областей устаревают.
+
+    Внутри транзакции поколения сдвигаются ещё раз после её фиксации:
+    параллельный запрос мог успеть собрать страницу по старым строкам
+    и положить её в кеш под уже сдвинутым поколением.
+    """
+    scopes = set(scopes)
+    _bump(scopes)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(scopes))
+
+
+def page_etag(request, *parts):
+    """ETag страницы: адрес, пользователь и переданные версии данных.
+
+    Страница, собранная по реплике, может отставать от поколений в кеше,
+    поэтому при чтении из реплик ETag меняется каждые
+    REPLICA_MAX_LAG_SECONDS секунд.
+    """
+    if settings.DATABASE_REPLICAS and not is_pinned(request):
+        parts += (int(time.time() // settings.REPLICA_MAX_LAG_SECONDS),)
+    raw = repr((request.get_full_path(), request.user.pk, parts))
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+
+def conditional_response(request, render, etag, last_modified=None):
+    """304 Not Modified, если у клиента эта версия страницы, иначе render().
+
+    Проверка идёт до сборки страницы: шаблон в случае 304 не рендерится.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return render()
+    timestamp = last_modified and timegm(last_modified.utctimetuple())
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp
+    )
+    if response is None:
+        response = render()
+        if response.status_code != 200:
+            return response
+    response['ETag'] = etag
+    if timestamp:
+        response['Last-Modified'] = http_date(timestamp)
+    # Браузер переспрашивает сервер при каждом показе: проверка
+    # дешёвая, а страница не устаревает на срок max-age
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def conditional(get_validators):
+    """Условный GET для view.
+
+    get_validators получает запрос и аргументы view и, не собирая
+    страницу, возвращает пару (версия данных, Last-Modified или None)
+    либо None, если проверять нечего.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            def render():
+                return view(request, *args, **kwargs)
+
+            if (
+                request.method not in ('GET', 'HEAD')
+                or write_queue.pending(request)
+            ):
+                return render()
+            validators = get_validators(request, *args, **kwargs)
+            if validators is None:
+                return render()
+            version, last_modified = validators
+            return conditional_response(
+                request, render, page_etag(request, version), last_modified
+            )
+        return wrapper
+    return decorator
+
+
+def cache_feed(get_scopes):
+    """Аналог cache_page, ключ которого зависит от поколений областей.
+
+    get_scopes получает аргументы view и возвращает имена областей,
+    от которых зависит страница. Пока ни одна из них не изменилась,
+    страница отдаётся из кеша до FEED_CACHE_TIME секунд, а клиент с
+    тем же ETag получает 304.
+
+    Шапка и кнопка подписки у каждого пользователя свои, поэтому ключ
+    включает его id: анонимы делят одну запись, вошедший пользователь
+    видит только свою, а общие прокси его страницу не хранят.
+    Пользователь, только что писавший в базу или в очередь
+    posts.write_queue, кеш минует: в нём может лежать страница,
+    собранная по отстающей реплике или без его записей.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if write_queue.pending(request):
+                # Ни кеш, ни ETag не знают о записях, ждущих в очереди
+                return view(request, *args, **kwargs)
+            generations = get_generations(get_scopes(*args, **kwargs))
+            versions = '.'.join(
+                f'{scope}={generation}'
+                for scope, generation in sorted(generations.items())
+            )
+            if is_pinned(request):
+                cached_view = view
+            else:
+                # Vary: Cookie от SessionMiddleware ставится уже после
+                # cache_page и в ключ не попадает
+                raw = f'{versions}.user={request.user.pk}'
+                key_prefix = 'feed.' + hashlib.md5(raw.encode()).hexdigest()
+                cached_view = cache_page(
+                    settings.FEED_CACHE_TIME, key_prefix=key_prefix
+                )(view)
+            response = conditional_response(
+                request,
+                lambda: cached_view(request, *args, **kwargs),
+                page_etag(request, versions)
+            )
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def post_scopes(author_username, *group_slugs):
+    """Области, которые затрагивает изменение поста."""
+    return ['posts', f'author:{author_username}'] + [
+        f'group:{slug}' for slug in group_slugs
+    ]
+
+
+def author_scopes(*user_ids):
+    usernames = User.objects.filter(pk__in=user_ids).values_list(
+        'username', flat=True
+    )
+    return [f'author:{username}' for username in usernames]
+
+
+def group_scopes(*group_ids):
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True
+    )
+    return [f'group:{slug}' for slug in slugs]
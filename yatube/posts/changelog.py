@@ -0,0 +1,150 @@
+"""Журнал изменений (ChangeLog) и потребители, читающие его пачками.
+
+Сигналы posts.signals добавляют запись на каждое сохранение и удаление
+Post, Comment и Follow — во view и в админке. Массовые update() и
+bulk_create() в журнал не попадают, если код не пишет их сам через
+record_many, как import_posts. Пока CHANGE_LOG_CONSUMERS пуст,
+журнал не ведётся: его некому было бы читать и чистить.
+
+Потребитель наследует Consumer и обрабатывает записи в handle(), готовый
+LoggingConsumer пишет их в лог.
+Позиция потребителя хранится в ConsumerOffset и сдвигается в той же
+транзакции, что и handle(): если производные данные лежат в этой же
+базе, каждая запись учитывается ровно один раз.
+"""
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import ChangeLog, ConsumerOffset
+
+logger = logging.getLogger(__name__)
+
+
+def record(instance, action):
+    """Добавляет в журнал запись об изменении instance."""
+    record_many([instance], action)
+
+
+def record_many(instances, action):
+    """Записи журнала для пачки объектов одной модели, одним запросом.
+
+    Для bulk_create, который сигналов не шлёт.
+    """
+    if not settings.CHANGE_LOG_CONSUMERS or not instances:
+        return
+    ChangeLog.objects.bulk_create(
+        ChangeLog(
+            model=instance._meta.model_name,
+            object_id=instance.pk,
+            action=action,
+            payload=json.dumps(
+                fields['fields'], cls=DjangoJSONEncoder, ensure_ascii=False
+            )
+        )
+        for instance, fields in zip(
+            instances, serializers.serialize('python', instances)
+        )
+    )
+
+
+class Consumer:
+    """Потребитель журнала.
+
+    name — ключ позиции в ConsumerOffset, models — имена моделей
+    (model_name), которые нужны потребителю; None — все.
+    """
+
+    name = None
+    models = None
+    batch_size = 500
+
+    def handle(self, changes):
+        """Обрабатывает пачку записей ChangeLog в порядке их появления."""
+        raise NotImplementedError
+
+    def pending(self, after):
+        changes = ChangeLog.objects.filter(pk__gt=after)
+        if settings.CHANGE_LOG_SETTLE_SECONDS:
+            # Записи моложе этого могут стоять за ещё не
+            # закоммиченными транзакциями с меньшим id.
+            settled = timezone.now() - timedelta(
+                seconds=settings.CHANGE_LOG_SETTLE_SECONDS
+            )
+            changes = changes.filter(created__lte=settled)
+        return changes.order_by('pk')[:self.batch_size]
+
+    def run_once(self):
+        """Обрабатывает одну пачку; возвращает число прочитанных записей."""
+        with transaction.atomic():
+            offsets = ConsumerOffset.objects.select_for_update()
+            offset, _ = offsets.get_or_create(name=self.name)
+            changes = list(self.pending(offset.position))
+            if not changes:
+                return 0
+            wanted = [
+                change for change in changes
+                if self.models is None or change.model in self.models
+            ]
+            if wanted:
+                self.handle(wanted)
+            offset.position = changes[-1].pk
+            offset.save()
+        return len(changes)
+
+    def run(self):
+        """Дочитывает журнал до конца; возвращает число записей."""
+        total = 0
+        while True:
+            processed = self.run_once()
+            if not processed:
+                return total
+            total += processed
+
+
+class LoggingConsumer(Consumer):
+    """Пишет изменения в лог posts.changelog, по строке JSON на запись.
+
+    Куда уходят строки (файл, syslog, сборщик логов), задаёт LOGGING.
+    """
+
+    name = 'logging'
+
+    def handle(self, changes):
+        for change in changes:
+            logger.info(json.dumps({
+                'id': change.pk,
+                'model': change.model,
+                'object_id': change.object_id,
+                'action': change.action,
+                'created': change.created,
+                'data': change.data,
+            }, cls=DjangoJSONEncoder, ensure_ascii=False))
+
+
+def get_consumers():
+    """Потребители из settings.CHANGE_LOG_CONSUMERS."""
+    return [import_string(path)() for path in settings.CHANGE_LOG_CONSUMERS]
+
+
+def prune():
+    """Удаляет записи, которые прочитали все настроенные потребители."""
+    names = [consumer.name for consumer in get_consumers()]
+    positions = dict(
+        ConsumerOffset.objects.filter(name__in=names).values_list(
+            'name', 'position'
+        )
+    )
+    if not names or len(positions) < len(names):
+        return 0
+    deleted, _ = ChangeLog.objects.filter(
+        pk__lte=min(positions.values())
+    ).delete()
+    return deleted
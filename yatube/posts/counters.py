@@ -0,0 +1,82 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def _delta(field, delta):
+    if delta < 0:
+        return Greatest(F(field) + delta, 0)
+    return F(field) + delta
+
+
+def bump(queryset, **deltas):
+    """Атомарно сдвигает счётчики у строк queryset, не уходя ниже нуля."""
+    return queryset.update(**{
+        field: _delta(field, delta) for field, delta in deltas.items()
+    })
+
+
+def bump_user_stats(user_id, **deltas):
+    """Сдвигает счётчики UserStats; строку создаёт только для роста.
+
+    При удалении пользователя сигналы его постов и подписок приходят,
+    когда строки пользователя уже нет: создавать для него UserStats
+    нельзя, а уменьшать у несуществующей строки нечего.
+    """
+    if user_id is None:
+        return
+    if bump(UserStats.objects.filter(user_id=user_id), **deltas):
+        return
+    if all(delta <= 0 for delta in deltas.values()):
+        return
+    if User.objects.filter(pk=user_id).exists():
+        UserStats.objects.get_or_create(user_id=user_id)
+        bump(UserStats.objects.filter(user_id=user_id), **deltas)
+
+
+def get_user_stats(user):
+    """Счётчики пользователя; для пользователя без строки — нули."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats(user=user)
+
+
+def _count(model, field):
+    counts = model.objects.filter(**{field: OuterRef('pk')}).order_by()
+    counts = counts.values(field).annotate(total=Count('pk'))
+    return Coalesce(Subquery(counts.values('total')), 0)
+
+
+def recount_posts(author_ids=(), group_ids=()):
+    """Пересчитывает счётчики постов только у данных авторов и групп."""
+    missing = User.objects.filter(
+        pk__in=author_ids, stats__isnull=True
+    ).values_list('pk', flat=True)
+    UserStats.objects.bulk_create(UserStats(user_id=pk) for pk in missing)
+    UserStats.objects.filter(user_id__in=author_ids).update(
+        posts_count=_count(Post, 'author')
+    )
+    Group.objects.filter(pk__in=group_ids).update(
+        posts_count=_count(Post, 'group')
+    )
+
+
+def rebuild_counters():
+    """Пересчитывает все счётчики с нуля по текущим данным."""
+    with transaction.atomic():
+        missing = User.objects.filter(stats__isnull=True).values_list(
+            'pk', flat=True
+        )
+        UserStats.objects.bulk_create(
+            UserStats(user_id=pk) for pk in missing
+        )
+        Group.objects.update(posts_count=_count(Post, 'group'))
+        Post.objects.update(comments_count=_count(Comment, 'post'))
+        UserStats.objects.update(
+            posts_count=_count(Post, 'author'),
+            followers_count=_count(Follow, 'author'),
+            following_count=_count(Follow, 'user'),
+        )
@@ -1,5 +1,10 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+
+from . import thumbnails
 from .models import Post, Comment
+from .uploads import size_error, validate_image
 
 
 class PostForm(forms.ModelForm):
@@ -7,12 +12,35 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, oversized=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        # Поля, загрузку в которые оборвал LimitedTemporaryFileUploadHandler
+        self.oversized = oversized
+
     def clean_text(self):
         data = self.cleaned_data['text']
         if data == '':
             raise forms.ValidationError('Поле обязательно для заполнения!')
         return data
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            validate_image(image)
+        return image
+
+    def clean(self):
+        if self.add_prefix('image') in self.oversized:
+            self.add_error('image', size_error())
+        return super().clean()
+
+    def save(self, commit=True):
+        post = super().save(commit)
+        if commit and 'image' in self.changed_data:
+            # Миниатюру строим после коммита, когда файл уже в хранилище
+            transaction.on_commit(lambda: thumbnails.schedule(post))
+        return post
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
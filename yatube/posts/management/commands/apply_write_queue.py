@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.write_queue import apply_all
+
+
+class Command(BaseCommand):
+    help = (
+        'Применяет к базе очередь отложенной записи (WRITE_BEHIND) '
+        'пачками по WRITE_QUEUE_BATCH_SIZE'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--follow', type=float, default=None, metavar='SECONDS',
+            help='Не выходить, а опрашивать очередь с этим интервалом'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            applied = apply_all()
+            if applied:
+                self.stdout.write(f'Применено действий: {applied}')
+            if options['follow'] is None:
+                return
+            time.sleep(options['follow'])
@@ -0,0 +1,121 @@
+import random
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет ленты и страницу поста через тестовый клиент и '
+        'печатает p50/p95 времени ответа и число запросов к БД'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Сколько запросов на каждую страницу'
+        )
+        parser.add_argument(
+            '--warm-cache', action='store_true',
+            help='Не очищать кеш перед каждым запросом'
+        )
+        parser.add_argument(
+            '--deep-page', type=int, default=1,
+            help='Номер страницы ленты (?page=) для замеров'
+        )
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.client = Client()
+        follower = Follow.objects.exclude(user=None).first()
+        if follower:
+            self.client.force_login(follower.user)
+        pages = {
+            'index': self.index_urls,
+            'group_posts': self.group_urls,
+            'profile': self.profile_urls,
+            'post_detail': self.post_urls,
+        }
+        if follower:
+            pages['follow_index'] = self.follow_urls
+        self.stdout.write(
+            f'{"страница":<14}{"p50, мс":>10}{"p95, мс":>10}'
+            f'{"запр. p50":>11}{"запр. max":>11}'
+        )
+        for name, urls in pages.items():
+            targets = urls(options['requests'])
+            if not targets:
+                self.stdout.write(f'{name:<14}нет данных')
+                continue
+            self.measure(name, targets, options)
+
+    def measure(self, name, urls, options):
+        timings, queries = [], []
+        query = {'page': options['deep_page']}
+        for url in urls:
+            if not options['warm_cache']:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = self.client.get(url, query)
+                timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                self.stderr.write(f'{url}: HTTP {response.status_code}')
+            queries.append(len(captured))
+        self.stdout.write(
+            f'{name:<14}{percentile(timings, 0.5):>10.1f}'
+            f'{percentile(timings, 0.95):>10.1f}'
+            f'{statistics.median(queries):>11.0f}{max(queries):>11}'
+        )
+
+    def sample(self, model, amount):
+        """Случайные существующие объекты модели без ORDER BY RANDOM()."""
+        last = model.objects.aggregate(last=Max('pk'))['last']
+        if last is None:
+            return []
+        objects = []
+        for _ in range(amount):
+            pk = self.random.randint(1, last)
+            obj = model.objects.filter(pk__gte=pk).order_by('pk').first()
+            if obj is not None:
+                objects.append(obj)
+        return objects
+
+    def index_urls(self, amount):
+        return [reverse('posts:index')] * amount
+
+    def follow_urls(self, amount):
+        return [reverse('posts:follow_index')] * amount
+
+    def group_urls(self, amount):
+        return [
+            reverse('posts:group_list', args=(group.slug,))
+            for group in self.sample(Group, amount)
+        ]
+
+    def profile_urls(self, amount):
+        return [
+            reverse('posts:profile', args=(post.author.username,))
+            for post in self.sample(Post, amount)
+        ]
+
+    def post_urls(self, amount):
+        return [
+            reverse('posts:post_detail', args=(post.pk,))
+            for post in self.sample(Post, amount)
+        ]
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import build_missing
+
+
+class Command(BaseCommand):
+    help = 'Строит производные картинок постов, у которых их ещё нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Сколько постов проверять за одно обращение к хранилищу'
+        )
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help='Повторить картинки, которые построить не удалось'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only(
+            'pk', 'image', 'author_id', 'group_id'
+        ).order_by('pk').iterator(chunk_size=options['chunk_size'])
+        built = build_missing(
+            posts, options['chunk_size'], options['retry_failed']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Построено наборов: {built}'))
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.changelog import get_consumers, prune
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет журнал изменений через потребителей из '
+        'CHANGE_LOG_CONSUMERS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--consumer', action='append', dest='names', default=None,
+            help='Запустить только потребителя с этим name (можно повторять)'
+        )
+        parser.add_argument(
+            '--follow', type=float, default=None, metavar='SECONDS',
+            help='Не выходить, а опрашивать журнал с этим интервалом'
+        )
+        parser.add_argument(
+            '--prune', action='store_true',
+            help='Удалить записи, прочитанные всеми потребителями'
+        )
+
+    def handle(self, *args, **options):
+        consumers = get_consumers()
+        if options['names']:
+            unknown = set(options['names']) - {
+                consumer.name for consumer in consumers
+            }
+            if unknown:
+                raise CommandError(
+                    f'Нет таких потребителей: {", ".join(sorted(unknown))}'
+                )
+            consumers = [
+                consumer for consumer in consumers
+                if consumer.name in options['names']
+            ]
+        while True:
+            for consumer in consumers:
+                processed = consumer.run()
+                if processed:
+                    self.stdout.write(f'{consumer.name}: {processed}')
+            if options['prune']:
+                self.stdout.write(f'Удалено записей: {prune()}')
+            if options['follow'] is None:
+                return
+            time.sleep(options['follow'])
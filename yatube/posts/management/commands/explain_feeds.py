@@ -0,0 +1,130 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from posts.models import Follow, Group, Post, User
+
+FEED_INDEXES = (
+    'post_pub_date_idx',
+    'post_author_pub_date_idx',
+    'post_group_pub_date_idx',
+    'comment_post_created_idx',
+    'follow_author_user_idx',
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает планы и время запросов лент с индексами и без них. '
+        'Все изменения (включая --seed-posts) откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed-posts', type=int, default=0,
+            help='Сгенерировать столько постов перед замерами'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько раз выполнять каждый запрос'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['seed_posts']:
+                    self.seed(options['seed_posts'])
+                queries = self.feed_queries()
+                self.report('С индексами', queries, options['repeat'])
+                with connection.cursor() as cursor:
+                    for name in FEED_INDEXES:
+                        cursor.execute(
+                            f'DROP INDEX {connection.ops.quote_name(name)}'
+                        )
+                self.report('Без индексов', queries, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, amount):
+        User.objects.bulk_create(
+            User(username=f'explain_author_{number}')
+            for number in range(max(amount // 100, 1))
+        )
+        authors = list(User.objects.filter(
+            username__startswith='explain_author_'
+        ))
+        Group.objects.bulk_create(
+            Group(
+                title=f'Группа {number}',
+                slug=f'explain-group-{number}',
+                description='explain_feeds'
+            )
+            for number in range(10)
+        )
+        groups = list(Group.objects.filter(slug__startswith='explain-group-'))
+        Post.objects.bulk_create(
+            (
+                Post(
+                    text=f'Пост {number}',
+                    author=authors[number % len(authors)],
+                    group=groups[number % len(groups)],
+                )
+                for number in range(amount)
+            )
+        )
+        Follow.objects.bulk_create(
+            Follow(user=authors[0], author=author) for author in authors[1:]
+        )
+
+    def feed_queries(self):
+        author = User.objects.filter(posts__isnull=False).first()
+        group = Group.objects.filter(posts__isnull=False).first()
+        follower = User.objects.filter(follower__isnull=False).first()
+        post = Post.objects.filter(comments__isnull=False).first() or (
+            Post.objects.first()
+        )
+        feeds = {'index': Post.objects.for_feed()}
+        if group:
+            feeds['group_posts'] = group.posts.for_feed()
+        if author:
+            feeds['profile'] = author.posts.for_feed()
+            feeds['followers'] = Follow.objects.filter(author=author)
+        if follower:
+            feeds['follow_index'] = Post.objects.for_feed().filter(
+                author__following__user=follower
+            )
+        if post:
+            feeds['comments'] = post.comments.order_by('created')
+        return {name: queryset[:10] for name, queryset in feeds.items()}
+
+    def report(self, title, queries, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for name, queryset in queries.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(self.style.MIGRATE_LABEL(
+                f'{name}: медиана {statistics.median(timings):.2f} мс'
+            ))
+            self.stdout.write(self.explain(queryset, title))
+
+    def explain(self, queryset, title):
+        # Метка делает текст запроса уникальным: иначе sqlite3 отдаёт
+        # закешированный план, построенный до удаления индексов.
+        sql, params = queryset.query.sql_with_params()
+        prefix = connection.ops.explain_query_prefix()
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql} -- {title}', params)
+            return '\n'.join(
+                ' '.join(str(column) for column in row)
+                for row in cursor.fetchall()
+            )
@@ -0,0 +1,37 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.transfer import FORMATS, export_rows, guess_format, write_rows
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты в NDJSON или CSV, не загружая их все в память'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл выгрузки или - для stdout')
+        parser.add_argument('--format', choices=FORMATS, default=None)
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Сколько строк читать из базы за раз'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or guess_format(path)
+        rows = export_rows(Post.objects.all(), options['chunk_size'])
+        started = time.perf_counter()
+        if path == '-':
+            count = write_rows(self.stdout, rows, file_format)
+            report = sys.stderr
+        else:
+            with open(path, 'w', encoding='utf-8', newline='') as stream:
+                count = write_rows(stream, rows, file_format)
+            report = self.stdout
+        elapsed = time.perf_counter() - started
+        report.write(
+            f'Выгружено постов: {count} '
+            f'({count / max(elapsed, 1e-9):.0f} строк/с)\n'
+        )
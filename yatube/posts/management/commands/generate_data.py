@@ -0,0 +1,163 @@
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.bulk import bulk_create
+from posts.counters import rebuild_counters
+from posts.models import Comment, Follow, Group, Post, User
+from posts.search import rebuild_index
+from posts.timeline import rebuild_timelines
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует большой набор пользователей, групп, постов, '
+        'комментариев и подписок для нагрузочных замеров'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--comments', type=int, default=1000000)
+        parser.add_argument('--follows', type=int, default=200000)
+        parser.add_argument(
+            '--skew', type=float, default=2.0,
+            help='Перекос активности: 1 — равномерно, больше — сильнее '
+                 'концентрация постов и подписчиков у первых авторов'
+        )
+        parser.add_argument(
+            '--days', type=float, default=365,
+            help='За сколько последних дней распределить даты постов и '
+                 'комментариев'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.skew = options['skew']
+        self.batch_size = options['batch_size']
+        self.run = time.time_ns()
+        self.now = timezone.now()
+        self.span = timedelta(days=options['days'])
+        started = time.perf_counter()
+        users = self.create(
+            User, options['users'], lambda number: User(
+                username=f'seed{self.run}_{number}', password='!'
+            )
+        )
+        groups = self.create(
+            Group, options['groups'], lambda number: Group(
+                title=f'Группа {number}',
+                slug=f'seed{self.run}-{number}',
+                description='Сгенерированная группа'
+            )
+        )
+        if not users:
+            return
+        amount = options['posts']
+        posts = self.create(
+            Post, amount,
+            lambda number: self.build_post(number, amount, users, groups),
+            keep_dates=['pub_date']
+        )
+        if posts:
+            self.create(
+                Comment, options['comments'],
+                lambda number: self.build_comment(number, posts, users),
+                keep_dates=['created']
+            )
+        self.create_follows(users, options['follows'])
+        self.stdout.write('Пересчёт счётчиков, лент и поискового индекса...')
+        rebuild_counters()
+        if settings.FOLLOW_FEED_FANOUT:
+            rebuild_timelines()
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - started:.1f} с'
+        ))
+
+    def pick(self, ids, skewed=True):
+        """Случайный id из списка; skewed — по степенному закону."""
+        value = self.random.random()
+        if skewed:
+            value **= self.skew
+        return ids[int(value * len(ids))]
+
+    def post_date(self, number, amount):
+        """Посты равномерно покрывают последние --days дней по порядку id."""
+        return self.now - self.span * (1 - (number + 0.5) / amount)
+
+    def build_post(self, number, amount, users, groups):
+        published = self.post_date(number, amount)
+        return Post(
+            text=f'Сгенерированный пост {number}',
+            author_id=self.pick(users),
+            group_id=self.pick(groups) if groups else None,
+            pub_date=published,
+            updated=published,
+        )
+
+    def build_comment(self, number, posts, users):
+        """Комментарий к случайному посту, оставленный после его публикации."""
+        index = self.pick(range(len(posts)))
+        published = self.post_date(index, len(posts))
+        return Comment(
+            text=f'Комментарий {number}',
+            post_id=posts[index],
+            author_id=self.pick(users, skewed=False),
+            created=published + (self.now - published) * self.random.random(),
+        )
+
+    def create(self, model, amount, build, keep_dates=()):
+        """Вставляет amount объектов пачками; возвращает список их id."""
+        ids = []
+        if not amount:
+            return ids
+        started = time.perf_counter()
+        for offset in range(0, amount, self.batch_size):
+            objects = [
+                build(number) for number in range(
+                    offset, min(offset + self.batch_size, amount)
+                )
+            ]
+            bulk_create(model, objects, keep_dates)
+            ids.extend(obj.pk for obj in objects)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{model.__name__}: {amount} '
+            f'({amount / elapsed:.0f} строк/с)'
+        )
+        return ids
+
+    def create_follows(self, users, amount):
+        """Подписки без повторов; попыток выбрать пару — не больше
+        десяти на подписку, так что перекос не зацикливает генерацию."""
+        amount = min(amount, len(users) * (len(users) - 1))
+        edges = set()
+        for _ in range(amount * 10):
+            if len(edges) == amount:
+                break
+            user_id = self.pick(users, skewed=False)
+            author_id = self.pick(users)
+            if user_id != author_id:
+                edges.add((user_id, author_id))
+        edges = list(edges)
+        before = Follow.objects.count()
+        for offset in range(0, len(edges), self.batch_size):
+            Follow.objects.bulk_create(
+                [
+                    Follow(user_id=user_id, author_id=author_id)
+                    for user_id, author_id in edges[
+                        offset:offset + self.batch_size
+                    ]
+                ],
+                ignore_conflicts=True
+            )
+        # ignore_conflicts молча пропускает уже существующие подписки
+        self.stdout.write(f'Подписки: {Follow.objects.count() - before}')
@@ -0,0 +1,68 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts.transfer import (
+    FORMATS, build_posts, chunks, guess_format, read_rows, save_posts
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает посты из NDJSON или CSV пачками через bulk_create; '
+        'авторы и группы должны уже существовать'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл выгрузки или - для stdin')
+        parser.add_argument('--format', choices=FORMATS, default=None)
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Строк на пачку: одна транзакция и один поиск авторов '
+                 'и групп'
+        )
+        parser.add_argument(
+            '--keep-ids', action='store_true',
+            help='Сохранить id из файла; посты с занятыми id пропускаются'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or guess_format(path)
+        if path == '-':
+            self.load(sys.stdin, file_format, options)
+            return
+        try:
+            stream = open(path, encoding='utf-8', newline='')
+        except OSError as error:
+            raise CommandError(error)
+        with stream:
+            self.load(stream, file_format, options)
+
+    def load(self, stream, file_format, options):
+        imported = skipped = 0
+        started = time.perf_counter()
+        rows = read_rows(stream, file_format)
+        for chunk in chunks(rows, options['batch_size']):
+            posts, errors = build_posts(chunk, options['keep_ids'])
+            with transaction.atomic():
+                save_posts(posts)
+            imported += len(posts)
+            skipped += len(errors)
+            for number, error in errors:
+                self.stderr.write(f'Строка {number}: {error}')
+            if options['verbosity'] > 1:
+                self.stdout.write(
+                    f'{imported} постов, '
+                    f'{imported / self.elapsed(started):.0f} строк/с'
+                )
+        elapsed = self.elapsed(started)
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено постов: {imported} '
+            f'({imported / elapsed:.0f} строк/с), пропущено: {skipped}'
+        ))
+
+    def elapsed(self, started):
+        return max(time.perf_counter() - started, 1e-9)
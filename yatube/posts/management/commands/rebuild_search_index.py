@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import rebuild_index, uses_fts5
+
+
+class Command(BaseCommand):
+    help = 'Строит поисковый индекс постов с нуля'
+
+    def handle(self, *args, **options):
+        rebuild_index()
+        backend = 'FTS5' if uses_fts5() else 'SearchTerm'
+        self.stdout.write(self.style.SUCCESS(f'Индекс {backend} построен'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.timeline import rebuild_timelines
+
+
+class Command(BaseCommand):
+    help = 'Заново собирает материализованные ленты подписок'
+
+    def handle(self, *args, **options):
+        rebuild_timelines()
+        self.stdout.write(self.style.SUCCESS('Ленты подписок собраны'))
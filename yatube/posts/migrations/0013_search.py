@@ -0,0 +1,104 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:08
+
+import re
+import sqlite3
+from collections import Counter
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+FTS_TABLE = 'posts_post_fts'
+WORD = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+LENGTH_TERM = ''
+BATCH_SIZE = 500
+
+
+def fts5_supported():
+    db = sqlite3.connect(':memory:')
+    try:
+        db.execute('CREATE VIRTUAL TABLE probe USING fts5(text)')
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        db.close()
+    return True
+
+
+def search_terms(SearchTerm, post_id, text):
+    counts = Counter(
+        word for word in WORD.findall(text.casefold())
+        if len(word) <= MAX_TERM_LENGTH
+    )
+    return [
+        SearchTerm(term=term, post_id=post_id, frequency=frequency)
+        for term, frequency in counts.items()
+    ] + [
+        SearchTerm(
+            term=LENGTH_TERM, post_id=post_id,
+            frequency=sum(counts.values())
+        )
+    ]
+
+
+def build_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    has_fts5 = connection.vendor == 'sqlite' and fts5_supported()
+    if has_fts5:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+                f'USING fts5(text)'
+            )
+    backend = settings.POST_SEARCH_BACKEND
+    if backend == 'fts5' or backend == 'auto' and has_fts5:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) '
+                f'SELECT id, text FROM posts_post'
+            )
+        return
+    Post = apps.get_model('posts', 'Post')
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    batch = []
+    posts = Post.objects.using(connection.alias).values_list('pk', 'text')
+    for post_id, text in posts.iterator():
+        batch.extend(search_terms(SearchTerm, post_id, text))
+        if len(batch) >= BATCH_SIZE:
+            SearchTerm.objects.using(connection.alias).bulk_create(batch)
+            batch = []
+    SearchTerm.objects.using(connection.alias).bulk_create(batch)
+
+
+def drop_search_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Слово')),
+                ('frequency', models.PositiveIntegerField(verbose_name='Сколько раз встречается')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Слово поискового индекса',
+                'verbose_name_plural': 'Слова поискового индекса',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='unique_search_term'),
+        ),
+        migrations.RunPython(build_search_index, drop_search_index),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_updated_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageDerivatives',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.CharField(max_length=255, unique=True, verbose_name='Картинка')),
+                ('files', models.TextField(blank=True, verbose_name='Производные в JSON')),
+                ('failed', models.BooleanField(default=False, verbose_name='Построить не удалось')),
+            ],
+            options={
+                'verbose_name': 'Производные картинки',
+                'verbose_name_plural': 'Производные картинок',
+            },
+        ),
+    ]
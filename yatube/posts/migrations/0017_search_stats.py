@@ -0,0 +1,99 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:18
+
+import re
+import unicodedata
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+WORD = re.compile(r'[^\W_]+')
+MAX_TERM_LENGTH = 64
+LENGTH_TERM = ''
+BATCH_SIZE = 500
+STATS_PK = 1
+
+
+def fold(word):
+    word = word.lower()
+    if word.isascii():
+        return word
+    chars = []
+    for char in word:
+        decomposed = unicodedata.normalize('NFD', char)
+        if (
+            len(decomposed) == 2 and decomposed[0].isascii()
+            and unicodedata.combining(decomposed[1])
+        ):
+            char = decomposed[0]
+        chars.append(char)
+    return ''.join(chars)
+
+
+def search_terms(SearchTerm, post_id, text):
+    counts = Counter(
+        fold(word) for word in WORD.findall(text)
+        if len(word) <= MAX_TERM_LENGTH
+    )
+    return [
+        SearchTerm(term=term, post_id=post_id, frequency=frequency)
+        for term, frequency in counts.items()
+    ] + [
+        SearchTerm(
+            term=LENGTH_TERM, post_id=post_id,
+            frequency=sum(counts.values())
+        )
+    ]
+
+
+def reindex_search_terms(apps, schema_editor):
+    """Перестраивает SearchTerm под новый токенизатор и считает размер."""
+    alias = schema_editor.connection.alias
+    Post = apps.get_model('posts', 'Post')
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    SearchStats = apps.get_model('posts', 'SearchStats')
+    terms = SearchTerm.objects.using(alias)
+    if not terms.exists():
+        # Работает FTS5: его индекс токенизатор не менял
+        return
+    terms.all().delete()
+    batch = []
+    posts = Post.objects.using(alias).values_list('pk', 'text')
+    for post_id, text in posts.iterator():
+        batch.extend(search_terms(SearchTerm, post_id, text))
+        if len(batch) >= BATCH_SIZE:
+            terms.bulk_create(batch)
+            batch = []
+    terms.bulk_create(batch)
+    corpus = terms.filter(term=LENGTH_TERM).aggregate(
+        documents=Count('pk'), total_length=Sum('frequency')
+    )
+    SearchStats.objects.using(alias).create(
+        pk=STATS_PK, documents=corpus['documents'],
+        total_length=corpus['total_length'] or 0
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('documents', models.PositiveIntegerField(default=0, verbose_name='Постов в индексе')),
+                ('total_length', models.BigIntegerField(default=0, verbose_name='Суммарная длина постов')),
+            ],
+            options={
+                'verbose_name': 'Размер поискового индекса',
+                'verbose_name_plural': 'Размер поискового индекса',
+            },
+        ),
+        migrations.RunPython(
+            reindex_search_terms, migrations.RunPython.noop
+        ),
+    ]
@@ -1,4 +1,7 @@
+import json
+
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 
@@ -20,11 +23,37 @@ class Group(models.Model):
         verbose_name='Описание группы',
         help_text='Задайте описание группы'
     )
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0,
+        editable=False
+    )
 
     def __str__(self) -> str:
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    FEED_FIELDS = (
+        'text',
+        'pub_date',
+        'updated',
+        'image',
+        'comments_count',
+        'author__username',
+        'author__first_name',
+        'author__last_name',
+        'group__slug',
+        'group__title',
+    )
+
+    def for_feed(self):
+        """Посты для лент: автор и группа одним запросом, без лишних полей."""
+        return self.select_related('author', 'group').only(
+            'author', 'group', *self.FEED_FIELDS
+        )
+
+
 class Post(models.Model):
     text = models.TextField(
         'Текст поста',
@@ -35,6 +64,10 @@ class Post(models.Model):
         help_text='Дата публикации поста',
         auto_now_add=True
     )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        default=timezone.now
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -56,16 +89,37 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
         get_latest_by = 'pub_date'
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=['-pub_date'], name='post_pub_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date'], name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date'], name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text
 
+    def save(self, *args, **kwargs):
+        # Как auto_now, но bulk_create и импорт могут задать дату сами
+        self.updated = timezone.now()
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -90,6 +144,13 @@ class Comment(models.Model):
         auto_now_add=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created'], name='comment_post_created_idx'
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -114,3 +175,173 @@ class Follow(models.Model):
                 fields=['user', 'author'], name='unique_links'
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'], name='follow_author_user_idx'
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, поддерживаемые сигналами posts.signals."""
+
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return f'Счётчики {self.user_id}'
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        ordering = ['-pub_date']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_feed_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date'], name='feed_user_pub_date_idx'
+            ),
+        ]
+
+
+class SearchTerm(models.Model):
+    """Строка инвертированного индекса: слово и пост, где оно встречается.
+
+    Заполняется posts.search, когда полнотекстовый индекс FTS5 недоступен.
+    """
+
+    term = models.CharField('Слово', max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+        verbose_name='Пост'
+    )
+    frequency = models.PositiveIntegerField('Сколько раз встречается')
+
+    class Meta:
+        verbose_name = 'Слово поискового индекса'
+        verbose_name_plural = 'Слова поискового индекса'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['term', 'post'], name='unique_search_term'
+            ),
+        ]
+
+    def __str__(self):
+        return self.term
+
+
+class SearchStats(models.Model):
+    """Размер индекса SearchTerm для BM25: число постов и их общая длина.
+
+    Единственная строка; её сдвигает posts.search вместе с индексом.
+    """
+
+    documents = models.PositiveIntegerField('Постов в индексе', default=0)
+    total_length = models.BigIntegerField('Суммарная длина постов', default=0)
+
+    class Meta:
+        verbose_name = 'Размер поискового индекса'
+        verbose_name_plural = 'Размер поискового индекса'
+
+    def __str__(self):
+        return f'{self.documents} постов, {self.total_length} слов'
+
+
+class ChangeLog(models.Model):
+    """Запись журнала изменений постов, комментариев и подписок.
+
+    Пишется сигналами posts.signals в той же транзакции, что и само
+    изменение; читают журнал потребители из posts.changelog.
+    """
+
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    ACTIONS = (
+        (CREATE, 'Создание'),
+        (UPDATE, 'Изменение'),
+        (DELETE, 'Удаление'),
+    )
+
+    model = models.CharField('Модель', max_length=32)
+    object_id = models.PositiveIntegerField('id объекта')
+    action = models.CharField('Действие', max_length=6, choices=ACTIONS)
+    payload = models.TextField('Поля объекта в JSON')
+    created = models.DateTimeField('Время изменения', auto_now_add=True)
+
+    class Meta:
+        ordering = ['pk']
+        verbose_name = 'Изменение'
+        verbose_name_plural = 'Журнал изменений'
+
+    def __str__(self):
+        return f'{self.action} {self.model} {self.object_id}'
+
+    @property
+    def data(self):
+        return json.loads(self.payload)
+
+
+class ConsumerOffset(models.Model):
+    """До какой записи ChangeLog дочитал потребитель."""
+
+    name = models.CharField('Потребитель', max_length=100, primary_key=True)
+    position = models.PositiveIntegerField('Последняя запись', default=0)
+    updated = models.DateTimeField('Обновлено', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Позиция потребителя'
+        verbose_name_plural = 'Позиции потребителей'
+
+    def __str__(self):
+        return f'{self.name}: {self.position}'
+
+
+class ImageDerivatives(models.Model):
+    """Производные картинки поста для карточек (posts.thumbnails)."""
+
+    image = models.CharField('Картинка', max_length=255, unique=True)
+    files = models.TextField('Производные в JSON', blank=True)
+    failed = models.BooleanField('Построить не удалось', default=False)
+
+    class Meta:
+        verbose_name = 'Производные картинки'
+        verbose_name_plural = 'Производные картинок'
+
+    def __str__(self):
+        return self.image
@@ -0,0 +1,173 @@
+import base64
+import binascii
+import heapq
+from collections.abc import Sequence
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(direction, position):
+    """Упаковывает направление и позицию (дата, id) в токен для ?cursor=."""
+    date, pk = position
+    raw = f'{direction}|{date.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Распаковывает токен; при любой ошибке бросает InvalidCursor."""
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(cursor + padding).decode()
+        direction, date, pk = raw.split('|')
+        date = parse_datetime(date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+    if direction not in (NEXT, PREVIOUS) or date is None:
+        raise InvalidCursor(cursor)
+    return direction, (date, pk)
+
+
+class CursorPage(Sequence):
+    """Страница курсорной пагинации, совместимая с шаблонами ленты."""
+
+    is_cursor = True
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset-пагинация по (date_field, id) без COUNT и OFFSET.
+
+    Стоимость любой страницы — один индексный запрос на per_page + 1
+    строк, поэтому глубокие страницы не дороже первой. По умолчанию
+    новые объекты идут первыми, ascending=True — наоборот.
+    """
+
+    def __init__(
+        self, object_list, per_page, date_field='pub_date', ascending=False
+    ):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.date_field = date_field
+        self.ascending = ascending
+
+    def position(self, obj):
+        return getattr(obj, self.date_field), obj.pk
+
+    def before(self, position):
+        date, pk = position
+        return (
+            Q(**{f'{self.date_field}__lt': date})
+            | Q(**{self.date_field: date, 'pk__lt': pk})
+        )
+
+    def after(self, position):
+        date, pk = position
+        return (
+            Q(**{f'{self.date_field}__gt': date})
+            | Q(**{self.date_field: date, 'pk__gt': pk})
+        )
+
+    def descending(self, direction):
+        """Идёт ли обход в direction от новых объектов к старым."""
+        return (direction == NEXT) != self.ascending
+
+    def fetch_from(self, queryset, direction, position):
+        descending = self.descending(direction)
+        if position is not None:
+            queryset = queryset.filter(
+                self.before(position) if descending else self.after(position)
+            )
+        if descending:
+            queryset = queryset.order_by(f'-{self.date_field}', '-pk')
+        else:
+            queryset = queryset.order_by(self.date_field, 'pk')
+        return list(queryset[:self.per_page + 1])
+
+    def fetch(self, direction, position):
+        """Возвращает до per_page + 1 объектов в порядке обхода."""
+        return self.fetch_from(self.object_list, direction, position)
+
+    def get_page(self, cursor=None):
+        """Возвращает страницу; неверный курсор ведёт на первую страницу."""
+        direction, position = NEXT, None
+        if cursor:
+            try:
+                direction, position = decode_cursor(cursor)
+            except InvalidCursor:
+                pass
+        rows = self.fetch(direction, position)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == PREVIOUS:
+            if not rows:
+                return self.get_page()
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor(NEXT, self.position(rows[-1]))
+        if rows and has_previous:
+            previous_cursor = encode_cursor(
+                PREVIOUS, self.position(rows[0])
+            )
+        return CursorPage(rows, next_cursor, previous_cursor)
+
+
+class MergingCursorPaginator(CursorPaginator):
+    """Курсорная пагинация по k-way слиянию нескольких querysets.
+
+    Из каждого потока читается не больше per_page + 1 строк, объекты,
+    встретившиеся в нескольких потоках, выдаются один раз.
+    """
+
+    def fetch(self, direction, position):
+        streams = (
+            self.fetch_from(queryset, direction, position)
+            for queryset in self.object_list
+        )
+        merged = heapq.merge(
+            *streams, key=self.position, reverse=self.descending(direction)
+        )
+        rows, seen = [], set()
+        for obj in merged:
+            if obj.pk in seen:
+                continue
+            seen.add(obj.pk)
+            rows.append(obj)
+            if len(rows) > self.per_page:
+                break
+        return rows
@@ -0,0 +1,362 @@
+"""Полнотекстовый поиск по постам.
+
+На SQLite с FTS5 индекс — виртуальная таблица posts_post_fts, выдача
+ранжируется её bm25. Иначе работает инвертированный индекс в SearchTerm:
+слова и ранжирование по той же формуле BM25 считаются на Python.
+Индекс обновляют сигналы posts.signals; после смены POST_SEARCH_BACKEND
+или массовых правок в обход ORM нужен manage.py rebuild_search_index.
+"""
+import math
+import re
+import sqlite3
+import unicodedata
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection as default_connection
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils.functional import cached_property
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post, SearchStats, SearchTerm
+
+FTS_TABLE = 'posts_post_fts'
+# Слова делятся так же, как в токенизаторе unicode61 у FTS5:
+# подчёркивание — разделитель, а не часть слова
+WORD = re.compile(r'[^\W_]+')
+MAX_TERM_LENGTH = 64
+# Служебное «слово» SearchTerm, в frequency которого хранится длина поста
+LENGTH_TERM = ''
+SNIPPET_WORDS = 16
+MARK_START, MARK_END = '\x02', '\x03'
+# Параметры BM25 — те же, что у bm25() в FTS5
+K1, B = 1.2, 0.75
+# Сколько строк SearchTerm набирать в памяти при перестройке индекса
+BATCH_SIZE = 500
+STATS_PK = 1
+
+
+@lru_cache(maxsize=4096)
+def _fold_char(char):
+    # unicode61 снимает с латинской буквы один диакритический знак
+    decomposed = unicodedata.normalize('NFD', char)
+    if (
+        len(decomposed) == 2 and decomposed[0].isascii()
+        and unicodedata.combining(decomposed[1])
+    ):
+        return decomposed[0]
+    return char
+
+
+def fold(word):
+    """Слово в том виде, в каком его хранит индекс FTS5."""
+    word = word.lower()
+    if word.isascii():
+        return word
+    return ''.join(_fold_char(char) for char in word)
+
+
+def tokenize(text):
+    return [
+        fold(word) for word in WORD.findall(text)
+        if len(word) <= MAX_TERM_LENGTH
+    ]
+
+
+@lru_cache(maxsize=None)
+def fts5_supported():
+    """Собран ли SQLite, с которым работает Python, с модулем FTS5."""
+    db = sqlite3.connect(':memory:')
+    try:
+        db.execute('CREATE VIRTUAL TABLE probe USING fts5(text)')
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        db.close()
+    return True
+
+
+def uses_fts5():
+    backend = settings.POST_SEARCH_BACKEND
+    if backend == 'auto':
+        return default_connection.vendor == 'sqlite' and fts5_supported()
+    return backend == 'fts5'
+
+
+def highlight(snippet):
+    """Экранирует фрагмент и превращает маркеры совпадений в <mark>."""
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+def make_snippet(text, terms):
+    """Фрагмент текста вокруг первого совпадения, как snippet() в FTS5."""
+    words = list(WORD.finditer(text))
+    if not words:
+        return highlight(text)
+    first = next(
+        (
+            number for number, word in enumerate(words)
+            if fold(word.group()) in terms
+        ),
+        0
+    )
+    start = max(first - SNIPPET_WORDS // 4, 0)
+    end = min(start + SNIPPET_WORDS, len(words))
+    parts = ['…'] if start else []
+    position = words[start].start()
+    for word in words[start:end]:
+        parts.append(text[position:word.start()])
+        if fold(word.group()) in terms:
+            parts.append(MARK_START + word.group() + MARK_END)
+        else:
+            parts.append(word.group())
+        position = word.end()
+    parts.append('…' if end < len(words) else text[position:])
+    return highlight(''.join(parts))
+
+
+def _terms_for(post_id, text):
+    counts = Counter(tokenize(text))
+    return [
+        SearchTerm(term=term, post_id=post_id, frequency=frequency)
+        for term, frequency in counts.items()
+    ] + [
+        SearchTerm(
+            term=LENGTH_TERM, post_id=post_id,
+            frequency=sum(counts.values())
+        )
+    ]
+
+
+def _bump_stats(documents, total_length):
+    if not (documents or total_length):
+        return
+    stats = SearchStats.objects.filter(pk=STATS_PK)
+    if not stats.update(
+        documents=F('documents') + documents,
+        total_length=F('total_length') + total_length
+    ):
+        SearchStats.objects.get_or_create(pk=STATS_PK)
+        _bump_stats(documents, total_length)
+
+
+def _indexed_length(post_ids):
+    """Число проиндексированных постов из post_ids и их общая длина."""
+    found = SearchTerm.objects.filter(
+        term=LENGTH_TERM, post_id__in=post_ids
+    ).values_list('frequency', flat=True)
+    found = list(found)
+    return len(found), sum(found)
+
+
+def index_post(post):
+    """Добавляет пост в индекс или обновляет его там."""
+    if uses_fts5():
+        with default_connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk]
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+                [post.pk, post.text]
+            )
+        return
+    old_documents, old_length = _indexed_length([post.pk])
+    SearchTerm.objects.filter(post_id=post.pk).delete()
+    terms = SearchTerm.objects.bulk_create(_terms_for(post.pk, post.text))
+    _bump_stats(1 - old_documents, terms[-1].frequency - old_length)
+
+
+def index_new_posts(posts):
+    """Добавляет в индекс пачку постов, которых там ещё нет."""
+    if uses_fts5():
+        with default_connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+                [(post.pk, post.text) for post in posts]
+            )
+        return
+    terms = SearchTerm.objects.bulk_create(
+        term for post in posts for term in _terms_for(post.pk, post.text)
+    )
+    lengths = [term.frequency for term in terms if term.term == LENGTH_TERM]
+    _bump_stats(len(lengths), sum(lengths))
+
+
+def remove_post(post_id):
+    """Убирает пост из индекса; вызывается до удаления самого поста."""
+    if uses_fts5():
+        with default_connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+            )
+        return
+    documents, length = _indexed_length([post_id])
+    SearchTerm.objects.filter(post_id=post_id).delete()
+    _bump_stats(-documents, -length)
+
+
+def rebuild_index():
+    """Строит индекс текущего бэкенда с нуля и очищает другой."""
+    connection = default_connection
+    has_fts_table = FTS_TABLE in connection.introspection.table_names()
+    with transaction.atomic():
+        SearchTerm.objects.all().delete()
+        SearchStats.objects.all().delete()
+        if has_fts_table:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        if uses_fts5():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {FTS_TABLE} (rowid, text) '
+                    f'SELECT id, text FROM {Post._meta.db_table}'
+                )
+            return
+        batch = []
+        posts = Post.objects.values_list('pk', 'text')
+        for post_id, text in posts.iterator():
+            batch.extend(_terms_for(post_id, text))
+            if len(batch) >= BATCH_SIZE:
+                SearchTerm.objects.bulk_create(batch)
+                batch = []
+        SearchTerm.objects.bulk_create(batch)
+        corpus = SearchTerm.objects.filter(term=LENGTH_TERM).aggregate(
+            documents=Count('pk'), total_length=Sum('frequency')
+        )
+        SearchStats.objects.create(
+            pk=STATS_PK, documents=corpus['documents'],
+            total_length=corpus['total_length'] or 0
+        )
+
+
+class SearchResults:
+    """Ленивая выдача поиска: Paginator берёт у неё count() и срезы.
+
+    Посты в срезе — из Post.objects.for_feed(), с атрибутом snippet.
+    """
+
+    def __init__(self, terms):
+        self.terms = terms
+
+    def count(self):
+        raise NotImplementedError
+
+    def hits(self, offset, limit):
+        """Пары (pk поста, фрагмент или None) в порядке релевантности."""
+        raise NotImplementedError
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start = key.start or 0
+        stop = self.count() if key.stop is None else key.stop
+        hits = self.hits(start, stop - start)
+        posts = Post.objects.for_feed().in_bulk([pk for pk, _ in hits])
+        results = []
+        for pk, snippet in hits:
+            if pk not in posts:
+                # Пост удалён в обход сигналов
+                continue
+            post = posts[pk]
+            post.snippet = snippet or make_snippet(post.text, set(self.terms))
+            results.append(post)
+        return results
+
+
+class Fts5Results(SearchResults):
+    @cached_property
+    def match(self):
+        return ' '.join(f'"{term}"' for term in self.terms)
+
+    def count(self):
+        with default_connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                [self.match]
+            )
+            return cursor.fetchone()[0]
+
+    def hits(self, offset, limit):
+        with default_connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, snippet({FTS_TABLE}, 0, %s, %s, '…', %s) "
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY rank LIMIT %s OFFSET %s',
+                [MARK_START, MARK_END, SNIPPET_WORDS, self.match,
+                 limit, offset]
+            )
+            return [(pk, highlight(snippet)) for pk, snippet in cursor]
+
+
+class PythonResults(SearchResults):
+    @cached_property
+    def ranking(self):
+        """pk постов со всеми словами запроса, от лучших по BM25."""
+        postings = defaultdict(dict)
+        rows = SearchTerm.objects.filter(term__in=self.terms).values_list(
+            'term', 'post_id', 'frequency'
+        )
+        for term, post_id, frequency in rows:
+            postings[post_id][term] = frequency
+        matched = [
+            post_id for post_id, found in postings.items()
+            if len(found) == len(self.terms)
+        ]
+        if not matched:
+            return []
+        corpus = (
+            SearchStats.objects.filter(pk=STATS_PK).first() or SearchStats()
+        )
+        lengths = dict(SearchTerm.objects.filter(term=LENGTH_TERM).filter(
+            post_id__in=SearchTerm.objects.filter(
+                term=self.terms[0]
+            ).values('post_id')
+        ).values_list('post_id', 'frequency'))
+        frequencies = Counter(
+            term for found in postings.values() for term in found
+        )
+        idf = {
+            term: math.log(
+                (corpus.documents - found + 0.5) / (found + 0.5) + 1
+            )
+            for term, found in frequencies.items()
+        }
+        average = corpus.total_length / (corpus.documents or 1) or 1
+
+        def score(post_id):
+            norm = K1 * (1 - B + B * lengths.get(post_id, 0) / average)
+            return sum(
+                idf[term] * tf * (K1 + 1) / (tf + norm)
+                for term, tf in postings[post_id].items()
+            )
+
+        return sorted(matched, key=lambda pk: (-score(pk), -pk))
+
+    def count(self):
+        return len(self.ranking)
+
+    def hits(self, offset, limit):
+        return [
+            (pk, None) for pk in self.ranking[offset:offset + limit]
+        ]
+
+
+def find_posts(query):
+    """Выдача по запросу или None, если в нём нет ни одного слова."""
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return None
+    if uses_fts5():
+        return Fts5Results(terms)
+    return PythonResults(terms)
@@ -0,0 +1,159 @@
+from django.conf import settings
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from . import changelog, search, timeline
+from .caching import author_scopes, group_scopes, invalidate
+from .counters import bump, bump_user_stats
+from .models import ChangeLog, Comment, Follow, Group, Post
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    """Запоминает исходную группу, чтобы перенести счётчик при правке."""
+    instance._counted_group_id = instance.__dict__.get('group_id')
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    old_group_id = getattr(instance, '_counted_group_id', None)
+    if created:
+        bump_user_stats(instance.author_id, posts_count=1)
+        old_group_id = None
+    elif 'group_id' not in instance.__dict__:
+        return
+    if old_group_id != instance.group_id:
+        if old_group_id is not None:
+            bump(Group.objects.filter(pk=old_group_id), posts_count=-1)
+        if instance.group_id is not None:
+            bump(Group.objects.filter(pk=instance.group_id), posts_count=1)
+    instance._counted_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    bump_user_stats(instance.author_id, posts_count=-1)
+    if instance.group_id is not None:
+        bump(Group.objects.filter(pk=instance.group_id), posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        bump(Post.objects.filter(pk=instance.post_id), comments_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    bump(Post.objects.filter(pk=instance.post_id), comments_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, **kwargs):
+    if created:
+        bump_user_stats(instance.author_id, followers_count=1)
+        bump_user_stats(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    bump_user_stats(instance.author_id, followers_count=-1)
+    bump_user_stats(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created and settings.FOLLOW_FEED_FANOUT:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created and instance.user_id and settings.FOLLOW_FEED_FANOUT:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    if instance.user_id and settings.FOLLOW_FEED_FANOUT:
+        timeline.on_unfollow(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'text' in update_fields:
+        search.index_post(instance)
+
+
+# До удаления: к post_delete строки SearchTerm уже снесёт каскад,
+# и длину поста для SearchStats будет не узнать
+@receiver(pre_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
+
+
+@receiver(pre_save, sender=Post)
+def remember_stale_groups(sender, instance, **kwargs):
+    """Группы, страницы которых устареют после сохранения поста."""
+    instance._stale_group_ids = {
+        getattr(instance, '_counted_group_id', None), instance.group_id
+    } - {None}
+
+
+@receiver(post_save, sender=Post)
+def invalidate_saved_post(sender, instance, **kwargs):
+    invalidate(
+        'posts',
+        *author_scopes(instance.author_id),
+        *group_scopes(*instance._stale_group_ids)
+    )
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post(sender, instance, **kwargs):
+    invalidate(
+        'posts',
+        *author_scopes(instance.author_id),
+        *group_scopes(instance.group_id)
+    )
+
+
+@receiver(pre_save, sender=Group)
+def remember_old_slug(sender, instance, **kwargs):
+    instance._stale_slugs = {instance.slug} | set(
+        Group.objects.filter(pk=instance.pk).values_list('slug', flat=True)
+    )
+
+
+@receiver(post_save, sender=Group)
+def invalidate_saved_group(sender, instance, **kwargs):
+    invalidate('posts', *(f'group:{slug}' for slug in instance._stale_slugs))
+
+
+@receiver(post_delete, sender=Group)
+def invalidate_deleted_group(sender, instance, **kwargs):
+    invalidate('posts', f'group:{instance.slug}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow(sender, instance, **kwargs):
+    invalidate(*author_scopes(instance.author_id))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Follow)
+def log_saved(sender, instance, created, **kwargs):
+    changelog.record(
+        instance, ChangeLog.CREATE if created else ChangeLog.UPDATE
+    )
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Follow)
+def log_deleted(sender, instance, **kwargs):
+    changelog.record(instance, ChangeLog.DELETE)
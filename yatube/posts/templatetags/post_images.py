@@ -0,0 +1,40 @@
+from django import template
+from django.conf import settings
+from django.db import transaction
+
+from posts.thumbnails import cached_thumbnail, schedule
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def feed_thumbnail(context, post):
+    """Производные картинки поста (url, srcset, webp_srcset).
+
+    Пока их нет или построить их не удалось, возвращается оригинал — у
+    него есть только url. Сам тег производные не строит: недостающие он
+    ставит в пул потоков после коммита текущей транзакции, если пул
+    настроен (THUMBNAIL_WORKERS), иначе их достроит build_thumbnails. Если
+    view положил в контекст thumbnails (см. utils.page_thumbnails), набор
+    берётся оттуда.
+    """
+    if not post.image:
+        return None
+    prefetched = context.get('thumbnails') or {}
+    if post.image.name in prefetched:
+        thumbnail = prefetched[post.image.name]
+    else:
+        thumbnail = cached_thumbnail(post.image)
+    if thumbnail is None:
+        if settings.THUMBNAIL_WORKERS:
+            transaction.on_commit(lambda: schedule(post))
+        return post.image
+    if thumbnail.failed:
+        return post.image
+    return thumbnail
+
+
+@register.simple_tag
+def post_card_cache_time():
+    """Срок фрагментного кеша карточки поста, POST_CARD_CACHE_TIME."""
+    return settings.POST_CARD_CACHE_TIME
@@ -0,0 +1,174 @@
+"""Минимальный сервер с протоколом Redis (RESP) для тестов общего кеша.
+
+Понимает только то, что django-redis шлёт кешу Django: GET, MGET, SET,
+DEL, EXISTS, INCRBY, TTL, FLUSHDB, конвейер MULTI/EXEC и EVAL двух
+скриптов incr. Ключи живут в памяти процесса, где запущен сервер;
+клиенты из других процессов ходят к нему по TCP.
+"""
+import socketserver
+import threading
+import time
+
+OK = 'OK'
+
+
+class CommandError(Exception):
+    """Ошибка, которую сервер возвращает клиенту ответом -ERR."""
+
+
+class Store:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+        self.deadlines = {}
+
+    def alive(self, key):
+        deadline = self.deadlines.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.delete(key)
+        return key in self.values
+
+    def delete(self, key):
+        self.deadlines.pop(key, None)
+        return self.values.pop(key, None) is not None
+
+    def get(self, key):
+        return self.values[key] if self.alive(key) else None
+
+    def set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        exists = self.alive(key)
+        if b'NX' in options and exists or b'XX' in options and not exists:
+            return None
+        self.values[key] = value
+        self.deadlines.pop(key, None)
+        for unit, scale in ((b'PX', 1000), (b'EX', 1)):
+            if unit in options:
+                ttl = int(options[options.index(unit) + 1]) / scale
+                self.deadlines[key] = time.monotonic() + ttl
+        return OK
+
+    def incrby(self, key, delta):
+        try:
+            value = int(self.get(key) or 0) + int(delta)
+        except ValueError:
+            raise CommandError('value is not an integer or out of range')
+        self.values[key] = str(value).encode()
+        return value
+
+    def ttl(self, key, scale=1):
+        if not self.alive(key):
+            return -2
+        if key not in self.deadlines:
+            return -1
+        return int((self.deadlines[key] - time.monotonic()) * scale)
+
+    def eval(self, script, numkeys, *args):
+        # Скрипты django-redis для incr: с проверкой EXISTS и без неё
+        key, delta = args[0], args[int(numkeys)]
+        if b'EXISTS' in script and not self.alive(key):
+            return None
+        return self.incrby(key, delta)
+
+    def flush(self):
+        self.values.clear()
+        self.deadlines.clear()
+        return OK
+
+    def execute(self, command):
+        name, *args = command
+        commands = {
+            b'PING': lambda: 'PONG',
+            b'SELECT': lambda db: OK,
+            b'FLUSHDB': self.flush,
+            b'FLUSHALL': self.flush,
+            b'GET': self.get,
+            b'MGET': lambda *keys: [self.get(key) for key in keys],
+            b'SET': self.set,
+            b'DEL': lambda *keys: sum(self.delete(key) for key in keys),
+            b'EXISTS': lambda *keys: sum(self.alive(key) for key in keys),
+            b'INCR': lambda key: self.incrby(key, 1),
+            b'INCRBY': self.incrby,
+            b'TTL': self.ttl,
+            b'PTTL': lambda key: self.ttl(key, scale=1000),
+            b'EVAL': self.eval,
+        }
+        if name.upper() not in commands:
+            return CommandError(f'unknown command {name.decode()!r}')
+        try:
+            with self.lock:
+                return commands[name.upper()](*args)
+        except (CommandError, TypeError, IndexError) as error:
+            return CommandError(str(error))
+
+
+def encode(reply):
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, CommandError):
+        return f'-ERR {reply}\r\n'.encode()
+    if isinstance(reply, str):
+        return f'+{reply}\r\n'.encode()
+    if isinstance(reply, int):
+        return f':{reply}\r\n'.encode()
+    if isinstance(reply, bytes):
+        return b'$%d\r\n%s\r\n' % (len(reply), reply)
+    return b'*%d\r\n' % len(reply) + b''.join(map(encode, reply))
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    def read_line(self):
+        line = self.rfile.readline()
+        if not line:
+            raise EOFError
+        return line[:-2]
+
+    def read_command(self):
+        count = int(self.read_line()[1:])
+        command = []
+        for _ in range(count):
+            length = int(self.read_line()[1:])
+            command.append(self.rfile.read(length + 2)[:-2])
+        return command
+
+    def handle(self):
+        store = self.server.store
+        queued = None
+        while True:
+            try:
+                command = self.read_command()
+            except (EOFError, ConnectionError):
+                return
+            name = command[0].upper()
+            if name == b'MULTI':
+                queued, reply = [], OK
+            elif name == b'EXEC':
+                reply = [store.execute(command) for command in queued]
+                queued = None
+            elif queued is not None:
+                queued.append(command)
+                reply = 'QUEUED'
+            else:
+                reply = store.execute(command)
+            self.wfile.write(encode(reply))
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    """Сервер на свободном порту 127.0.0.1; url — для CACHE_URL."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), RespHandler)
+        self.store = Store()
+
+    @property
+    def url(self):
+        return f'redis://127.0.0.1:{self.server_address[1]}/0'
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,139 @@
+from django.conf import settings
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'пост {number}', author=cls.author,
+                group=cls.group if number % 2 else None
+            )
+            for number in range(settings.P_ON_PAGE + 3)
+        ]
+        cls.post = cls.posts[-1]
+        Comment.objects.create(post=cls.post, author=cls.reader, text='ок')
+
+    def test_feed_pages_with_cursor(self):
+        response = self.client.get(reverse('api:post_list'))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['results']), settings.P_ON_PAGE)
+        self.assertIsNone(data['previous'])
+        first = data['results'][0]
+        self.assertEqual(first['id'], self.post.pk)
+        self.assertEqual(
+            first['author'], {'username': 'author', 'full_name': 'Лев Толстой'}
+        )
+        self.assertEqual(first['comments_count'], 1)
+        self.assertIsNone(first['image'])
+        second = self.client.get(data['next']).json()
+        self.assertEqual(
+            [post['id'] for post in second['results']],
+            [post.pk for post in reversed(self.posts[:3])]
+        )
+        self.assertIsNone(second['next'])
+        self.assertIsNotNone(second['previous'])
+
+    def test_group_and_user_feeds(self):
+        group = self.client.get(
+            reverse('api:group_post_list', args=('group',))
+        ).json()
+        self.assertTrue(all(
+            post['group'] == {'slug': 'group', 'title': 'Группа'}
+            for post in group['results']
+        ))
+        user = self.client.get(
+            reverse('api:user_post_list', args=('reader',))
+        ).json()
+        self.assertEqual(user['results'], [])
+        missing = self.client.get(
+            reverse('api:group_post_list', args=('nope',))
+        )
+        self.assertEqual(missing.status_code, 404)
+        self.assertIn('detail', missing.json())
+
+    def test_sparse_fields(self):
+        response = self.client.get(
+            reverse('api:post_list'), {'fields': 'id,text'}
+        )
+        self.assertEqual(
+            set(response.json()['results'][0]), {'id', 'text'}
+        )
+        self.assertIn('fields=id%2Ctext', response.json()['next'])
+        bad = self.client.get(reverse('api:post_list'), {'fields': 'secret'})
+        self.assertEqual(bad.status_code, 400)
+
+    def test_post_detail_with_comments(self):
+        url = reverse('api:post_detail', args=(self.post.pk,))
+        data = self.client.get(url).json()
+        self.assertEqual(data['text'], self.post.text)
+        self.assertEqual(
+            [(c['text'], c['author']['username']) for c in data['comments']],
+            [('ок', 'reader')]
+        )
+        self.assertIsNone(data['comments_next'])
+        compact = self.client.get(url, {'fields': 'id'}).json()
+        self.assertEqual(compact, {'id': self.post.pk})
+        self.assertEqual(self.client.get(
+            reverse('api:post_detail', args=(0,))
+        ).status_code, 404)
+
+    def test_etag_returns_not_modified(self):
+        url = reverse('api:post_list')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'правка'
+        post.save()
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_detail_etag_follows_comments(self):
+        url = reverse('api:post_detail', args=(self.post.pk,))
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        Comment.objects.create(post=self.post, author=self.author, text='да')
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+    def test_not_modified_skips_serialization_queries(self):
+        url = reverse('api:post_list')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_follow_feed(self):
+        url = reverse('api:follow_post_list')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.force_login(self.reader)
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['results'][0]['id'], self.post.pk
+        )
+        self.assertIn('Cookie', response['Vary'])
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_read_only(self):
+        response = self.client.post(reverse('api:post_list'))
+        self.assertEqual(response.status_code, 405)
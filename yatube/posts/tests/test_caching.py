@@ -0,0 +1,253 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from importlib.util import find_spec
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.test import (
+    Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from ..caching import get_generations
+from ..models import Comment, Follow, Post, User
+from .resp_server import RespServer
+from yatube.cache_url import parse_cache_url
+
+BUMP_IN_OTHER_PROCESS = (
+    'import django; django.setup(); '
+    'from posts.caching import invalidate; invalidate("posts")'
+)
+
+
+class CacheUrlTest(SimpleTestCase):
+    def test_parse_cache_url(self):
+        """CACHE_URL превращается в настройку нужного бэкенда."""
+        urls = {
+            'locmem://': (
+                'django.core.cache.backends.locmem.LocMemCache', ''
+            ),
+            'file:///var/tmp/yatube': (
+                'django.core.cache.backends.filebased.FileBasedCache',
+                '/var/tmp/yatube'
+            ),
+            'memcached://10.0.0.1:11211,10.0.0.2:11211': (
+                'django.core.cache.backends.memcached.MemcachedCache',
+                ['10.0.0.1:11211', '10.0.0.2:11211']
+            ),
+            'redis://127.0.0.1:6379/1': (
+                'django_redis.cache.RedisCache', 'redis://127.0.0.1:6379/1'
+            ),
+        }
+        for url, (backend, location) in urls.items():
+            with self.subTest(url=url):
+                config = parse_cache_url(url, key_prefix='yt', version='3')
+                self.assertEqual(config['BACKEND'], backend)
+                self.assertEqual(config['LOCATION'], location)
+                self.assertEqual(config['KEY_PREFIX'], 'yt')
+                self.assertEqual(config['VERSION'], 3)
+
+    def test_unknown_scheme(self):
+        """Неизвестная схема — ошибка конфигурации, а не тихий locmem."""
+        with self.assertRaises(ValueError):
+            parse_cache_url('mongodb://localhost')
+
+
+class SharedCacheTestMixin:
+    """Процессы с одним CACHE_URL видят поколения друг друга.
+
+    Наследник в start_cache() поднимает общий кеш и возвращает его URL.
+    """
+
+    @classmethod
+    def start_cache(cls):
+        raise NotImplementedError
+
+    @classmethod
+    def stop_cache(cls):
+        pass
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cache_url = cls.start_cache()
+        cls.shared_cache = override_settings(CACHES={
+            'default': parse_cache_url(cls.cache_url, key_prefix='test')
+        })
+        cls.shared_cache.enable()
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.post = Post.objects.create(text='первый', author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.shared_cache.disable()
+        cls.stop_cache()
+
+    def setUp(self):
+        cache.clear()
+
+    def run_in_other_process(self, code):
+        env = dict(
+            os.environ,
+            CACHE_URL=self.cache_url,
+            CACHE_KEY_PREFIX='test',
+            DJANGO_SETTINGS_MODULE='yatube.settings',
+        )
+        subprocess.run(
+            [sys.executable, '-c', code],
+            cwd=settings.BASE_DIR, env=env, check=True
+        )
+
+    def test_invalidation_crosses_processes(self):
+        """Сдвиг поколения в другом процессе сбрасывает кеш этого."""
+        client = Client()
+        url = reverse('posts:index')
+        before = get_generations(['posts'])['posts']
+        cached = client.get(url).content
+        Post.objects.filter(pk=self.post.pk).update(
+            text='второй', updated=timezone.now()
+        )
+        self.assertEqual(client.get(url).content, cached)
+        self.run_in_other_process(BUMP_IN_OTHER_PROCESS)
+        self.assertEqual(get_generations(['posts'])['posts'], before + 1)
+        self.assertContains(client.get(url), 'второй')
+
+
+class FileSharedCacheTest(SharedCacheTestMixin, TestCase):
+    @classmethod
+    def start_cache(cls):
+        cls.cache_dir = tempfile.mkdtemp()
+        return f'file://{cls.cache_dir}'
+
+    @classmethod
+    def stop_cache(cls):
+        shutil.rmtree(cls.cache_dir, ignore_errors=True)
+
+
+@skipUnless(find_spec('django_redis'), 'не установлен django-redis')
+class RedisSharedCacheTest(SharedCacheTestMixin, TestCase):
+    """Бэкенд django-redis против сервера из resp_server."""
+
+    @classmethod
+    def start_cache(cls):
+        cls.server = RespServer()
+        cls.server.start()
+        return cls.server.url
+
+    @classmethod
+    def stop_cache(cls):
+        cls.server.stop()
+
+
+class InvalidateOnCommitTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='writer')
+
+    def test_page_cached_before_commit_is_dropped(self):
+        """Страница, собранная до фиксации записи, не живёт в кеше после."""
+        url = reverse('posts:index')
+        with transaction.atomic():
+            post = Post.objects.create(text='черновик', author=self.author)
+            # Запрос, попавший между сдвигом поколения и фиксацией
+            self.assertContains(self.client.get(url), 'черновик')
+            Post.objects.filter(pk=post.pk).update(
+                text='итог', updated=timezone.now()
+            )
+        self.assertContains(self.client.get(url), 'итог')
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='writer')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def revalidate(self, url, response, client=None):
+        return (client or self.client).get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+
+    def test_feed_not_modified_without_queries(self):
+        url = reverse('posts:index')
+        first = self.client.get(url)
+        self.assertIn('no-cache', first['Cache-Control'])
+        with self.assertNumQueries(0):
+            second = self.revalidate(url, first)
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.templates, [])
+        Post.objects.create(text='новый', author=self.author)
+        self.assertEqual(self.revalidate(url, first).status_code, 200)
+
+    def test_etag_depends_on_user_and_page(self):
+        url = reverse('posts:profile', args=('writer',))
+        anonymous = self.client.get(url)['ETag']
+        second_page = self.client.get(url, {'page': 2})
+        self.assertNotEqual(second_page['ETag'], anonymous)
+        self.client.force_login(self.reader)
+        self.assertNotEqual(self.client.get(url)['ETag'], anonymous)
+
+    def test_cached_page_is_per_user(self):
+        """Страница, закешированная для одного, не достаётся другим."""
+        url = reverse('posts:profile', args=('writer',))
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.reader)
+        warmed = self.client.get(url)
+        self.assertContains(warmed, 'Пользователь: reader')
+        self.assertTrue(warmed.context['following'])
+        self.assertIn('private', warmed['Cache-Control'])
+        other = Client()
+        other.force_login(User.objects.create_user(username='other'))
+        for client in (other, Client()):
+            with self.subTest(client=client):
+                response = client.get(url)
+                self.assertNotContains(response, 'Пользователь: reader')
+                self.assertNotContains(response, 'Отписаться')
+        self.assertContains(other.get(url), 'Пользователь: other')
+
+    def test_post_detail_validators(self):
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        first = self.client.get(url)
+        self.assertFalse(first.has_header('Last-Modified'))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.revalidate(url, first).status_code, 304)
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='новый комментарий'
+        )
+        second = self.revalidate(url, first)
+        self.assertContains(second, 'новый комментарий')
+        comment.delete()
+        self.assertEqual(self.revalidate(url, second).status_code, 200)
+
+    def test_post_detail_ignores_if_modified_since(self):
+        """Страница поста не отвечает 304 по одному If-Modified-Since."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_post_is_not_conditional(self):
+        url = reverse('posts:post_detail', args=(0,))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_follow_feed(self):
+        self.client.force_login(self.reader)
+        Follow.objects.create(user=self.reader, author=self.author)
+        url = reverse('posts:follow_index')
+        first = self.client.get(url)
+        self.assertEqual(self.revalidate(url, first).status_code, 304)
+        Post.objects.create(text='от автора', author=self.author)
+        self.assertContains(self.revalidate(url, first), 'от автора')
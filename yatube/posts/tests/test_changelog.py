@@ -0,0 +1,152 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..changelog import Consumer, LoggingConsumer, prune
+from ..models import ChangeLog, ConsumerOffset, Follow, Post, User
+
+CONSUMERS = [
+    'posts.tests.test_changelog.CollectingConsumer',
+    'posts.tests.test_changelog.FollowConsumer',
+]
+
+
+class CollectingConsumer(Consumer):
+    name = 'collect'
+    batch_size = 2
+    seen = []
+
+    def handle(self, changes):
+        self.seen.extend(
+            (change.model, change.action, change.object_id)
+            for change in changes
+        )
+
+
+class FollowConsumer(CollectingConsumer):
+    name = 'follows'
+    models = ('follow',)
+
+
+class BrokenConsumer(Consumer):
+    name = 'broken'
+
+    def handle(self, changes):
+        raise RuntimeError('сбой')
+
+
+@override_settings(CHANGE_LOG_CONSUMERS=CONSUMERS)
+class ChangeLogTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        CollectingConsumer.seen = []
+        self.client.force_login(self.reader)
+
+    def log(self):
+        return list(ChangeLog.objects.values_list(
+            'model', 'action', 'object_id'
+        ))
+
+    def test_views_write_change_log(self):
+        ChangeLog.objects.all().delete()
+        self.client.post(reverse('posts:post_create'), {'text': 'первый'})
+        post = Post.objects.get(text='первый')
+        self.client.post(
+            reverse('posts:post_edit', args=(post.pk,)), {'text': 'второй'}
+        )
+        self.client.post(
+            reverse('posts:add_comment', args=(post.pk,)), {'text': 'ок'}
+        )
+        self.client.get(reverse('posts:profile_follow', args=('author',)))
+        follow = Follow.objects.get(user=self.reader)
+        self.client.get(reverse('posts:profile_unfollow', args=('author',)))
+        self.assertEqual(self.log(), [
+            ('post', ChangeLog.CREATE, post.pk),
+            ('post', ChangeLog.UPDATE, post.pk),
+            ('comment', ChangeLog.CREATE, post.comments.get().pk),
+            ('follow', ChangeLog.CREATE, follow.pk),
+            ('follow', ChangeLog.DELETE, follow.pk),
+        ])
+        update = ChangeLog.objects.get(action=ChangeLog.UPDATE)
+        self.assertEqual(update.data['text'], 'второй')
+
+    def test_rolled_back_change_is_not_logged(self):
+        count = ChangeLog.objects.count()
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                Post.objects.create(text='откатится', author=self.author)
+                raise RuntimeError
+        self.assertEqual(ChangeLog.objects.count(), count)
+
+    def test_consumer_reads_batches_once(self):
+        ChangeLog.objects.all().delete()
+        posts = [
+            Post.objects.create(text=f'пост {number}', author=self.author)
+            for number in range(3)
+        ]
+        consumer = CollectingConsumer()
+        self.assertEqual(consumer.run_once(), 2)
+        self.assertEqual(consumer.run(), 1)
+        self.assertEqual(consumer.run(), 0)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(consumer.run(), 1)
+        self.assertEqual(
+            [change[2] for change in consumer.seen[:3]],
+            [post.pk for post in posts]
+        )
+        self.assertEqual(
+            ConsumerOffset.objects.get(name='collect').position,
+            ChangeLog.objects.last().pk
+        )
+
+    def test_consumer_filters_models(self):
+        Post.objects.create(text='пост', author=self.author)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        FollowConsumer().run()
+        self.assertEqual(
+            FollowConsumer.seen, [('follow', ChangeLog.CREATE, follow.pk)]
+        )
+
+    def test_failed_batch_keeps_offset(self):
+        Post.objects.create(text='пост', author=self.author)
+        with self.assertRaises(RuntimeError):
+            BrokenConsumer().run_once()
+        self.assertFalse(ConsumerOffset.objects.filter(name='broken').exists())
+
+    @override_settings(CHANGE_LOG_CONSUMERS=[])
+    def test_no_log_without_consumers(self):
+        count = ChangeLog.objects.count()
+        Post.objects.create(text='пост', author=self.author)
+        self.assertEqual(ChangeLog.objects.count(), count)
+
+    def test_logging_consumer(self):
+        ChangeLog.objects.all().delete()
+        post = Post.objects.create(text='пост', author=self.author)
+        with self.assertLogs('posts.changelog', 'INFO') as logs:
+            self.assertEqual(LoggingConsumer().run(), 1)
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(
+            (line['model'], line['action'], line['object_id']),
+            ('post', ChangeLog.CREATE, post.pk)
+        )
+        self.assertEqual(line['data']['text'], 'пост')
+
+    def test_command_and_prune(self):
+        Post.objects.create(text='пост', author=self.author)
+        call_command(
+            'consume_changes', '--consumer=collect', stdout=StringIO()
+        )
+        self.assertEqual(prune(), 0, 'follows ещё ничего не прочитал')
+        Follow.objects.create(user=self.reader, author=self.author)
+        out = StringIO()
+        call_command('consume_changes', '--prune', stdout=out)
+        self.assertIn('collect: 1', out.getvalue())
+        self.assertFalse(ChangeLog.objects.exists())
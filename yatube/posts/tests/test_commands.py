@@ -0,0 +1,255 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..models import (
+    ChangeLog, Comment, FeedEntry, Follow, Group, Post, User, UserStats
+)
+from ..search import find_posts
+
+
+class ExplainFeedsTest(TestCase):
+    def test_explain_feeds_rolls_back(self):
+        """explain_feeds печатает планы и не оставляет данных и изменений."""
+        out = StringIO()
+        call_command(
+            'explain_feeds', seed_posts=50, repeat=1, stdout=out
+        )
+        self.assertIn('post_author_pub_date_idx', out.getvalue())
+        self.assertIn('Без индексов', out.getvalue())
+        self.assertFalse(Post.objects.exists())
+        call_command('explain_feeds', repeat=1, stdout=StringIO())
+
+
+class GenerateDataTest(TestCase):
+    def test_generate_data(self):
+        """generate_data создаёт связанные данные и пересчитывает счётчики."""
+        call_command(
+            'generate_data', users=20, groups=3, posts=120, comments=60,
+            follows=40, batch_size=50, seed=1, stdout=StringIO()
+        )
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 120)
+        self.assertEqual(Comment.objects.count(), 60)
+        self.assertEqual(Follow.objects.count(), 40)
+        self.assertFalse(Follow.objects.filter(
+            user_id=F('author_id')
+        ).exists())
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts_count', flat=True)),
+            120
+        )
+
+    def test_dates_spread_over_days(self):
+        """Посты и комментарии получают даты за последние --days дней."""
+        started = timezone.now()
+        call_command(
+            'generate_data', users=5, groups=1, posts=600, comments=600,
+            follows=0, days=30, seed=1, stdout=StringIO()
+        )
+        dates = list(
+            Post.objects.order_by('pk').values_list('pub_date', flat=True)
+        )
+        self.assertEqual(dates, sorted(dates))
+        self.assertLess(dates[0], started - timedelta(days=29))
+        self.assertGreater(dates[-1], started - timedelta(days=1))
+        self.assertFalse(Post.objects.exclude(updated=F('pub_date')).exists())
+        self.assertFalse(
+            Comment.objects.filter(created__lt=F('post__pub_date')).exists()
+        )
+        self.assertLess(
+            Comment.objects.order_by('created').first().created,
+            started - timedelta(days=7)
+        )
+
+    def test_benchmark_views(self):
+        """benchmark_views печатает строку замеров для каждой страницы."""
+        call_command(
+            'generate_data', users=5, groups=2, posts=30, comments=10,
+            follows=5, seed=1, stdout=StringIO()
+        )
+        out = StringIO()
+        call_command('benchmark_views', requests=2, seed=1, stdout=out)
+        for page in (
+            'index', 'group_posts', 'profile', 'post_detail', 'follow_index'
+        ):
+            with self.subTest(page=page):
+                self.assertIn(page, out.getvalue())
+
+
+class TransferPostsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'пост {number}, "в кавычках"\nи со строкой',
+                author=cls.author, group=cls.group if number % 2 else None
+            )
+            for number in range(5)
+        ]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def snapshot(self):
+        return list(Post.objects.order_by('pk').values_list(
+            'text', 'pub_date', 'author__username', 'group__slug'
+        ))
+
+    def test_round_trip(self):
+        """Выгрузка и загрузка сохраняют текст, даты, авторов и группы."""
+        expected = self.snapshot()
+        for name in ('posts.ndjson', 'posts.csv'):
+            with self.subTest(name=name):
+                out = StringIO()
+                call_command('export_posts', self.path(name), stdout=out)
+                self.assertIn('Выгружено постов: 5', out.getvalue())
+                Post.objects.all().delete()
+                out = StringIO()
+                call_command(
+                    'import_posts', self.path(name), batch_size=2,
+                    stdout=out, stderr=StringIO()
+                )
+                self.assertIn('Загружено постов: 5', out.getvalue())
+                self.assertIn('строк/с', out.getvalue())
+                self.assertEqual(self.snapshot(), expected)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 5
+        )
+        self.assertEqual(Group.objects.get().posts_count, 2)
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        rows = [
+            {'text': 'хороший', 'author': 'author', 'group': 'group'},
+            {'text': 'чужой', 'author': 'nobody'},
+            {'text': 'без группы', 'author': 'author', 'group': 'nope'},
+            {'text': 'дата', 'author': 'author', 'pub_date': 'вчера'},
+        ]
+        with open(self.path('bad.ndjson'), 'w') as stream:
+            for row in rows:
+                stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+            stream.write('{не json\n')
+        err = StringIO()
+        call_command(
+            'import_posts', self.path('bad.ndjson'),
+            stdout=StringIO(), stderr=err
+        )
+        self.assertTrue(Post.objects.filter(text='хороший').exists())
+        self.assertEqual(Post.objects.count(), 6)
+        for line in range(2, 6):
+            with self.subTest(line=line):
+                self.assertIn(f'Строка {line}:', err.getvalue())
+
+    def test_keep_ids_skips_existing(self):
+        call_command(
+            'export_posts', self.path('posts.ndjson'), stdout=StringIO()
+        )
+        Post.objects.filter(pk=self.posts[0].pk).delete()
+        err = StringIO()
+        call_command(
+            'import_posts', self.path('posts.ndjson'), keep_ids=True,
+            stdout=StringIO(), stderr=err
+        )
+        self.assertTrue(Post.objects.filter(pk=self.posts[0].pk).exists())
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertEqual(err.getvalue().count('уже есть'), 4)
+
+    def test_import_keeps_both_dates(self):
+        """pub_date и updated берутся из файла, а не ставятся сейчас."""
+        row = {
+            'text': 'старый', 'author': 'author',
+            'pub_date': '2019-05-06T07:08:09+00:00',
+            'updated': '2020-01-02T03:04:05+00:00',
+        }
+        with open(self.path('dates.ndjson'), 'w') as stream:
+            stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+        call_command(
+            'import_posts', self.path('dates.ndjson'), stdout=StringIO()
+        )
+        post = Post.objects.get(text='старый')
+        self.assertEqual(
+            (post.pub_date.isoformat(), post.updated.isoformat()),
+            (row['pub_date'], row['updated'])
+        )
+
+    def test_batch_larger_than_insert_limit(self):
+        """--batch-size больше лимита SQLite на один INSERT не мешает."""
+        with open(self.path('many.ndjson'), 'w') as stream:
+            for number in range(600):
+                stream.write(json.dumps(
+                    {'text': f'строка {number}', 'author': 'author'},
+                    ensure_ascii=False
+                ) + '\n')
+        out = StringIO()
+        call_command(
+            'import_posts', self.path('many.ndjson'), batch_size=1000,
+            stdout=out, stderr=StringIO()
+        )
+        self.assertIn('Загружено постов: 600', out.getvalue())
+        self.assertEqual(Post.objects.count(), 605)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 605
+        )
+
+    @override_settings(
+        FOLLOW_FEED_FANOUT=True,
+        CHANGE_LOG_CONSUMERS=['posts.changelog.LoggingConsumer']
+    )
+    def test_import_updates_only_imported_posts(self):
+        """Импорт ведёт ленты, индекс и журнал без полного пересчёта."""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        rows = [
+            {'text': f'импортированный {number}', 'author': 'author',
+             'group': 'group', 'pub_date': '2020-01-02T03:04:05+00:00'}
+            for number in range(3)
+        ]
+        with open(self.path('new.ndjson'), 'w') as stream:
+            for row in rows:
+                stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+        with mock.patch(
+            'posts.counters.rebuild_counters', side_effect=AssertionError
+        ), mock.patch(
+            'posts.search.rebuild_index', side_effect=AssertionError
+        ):
+            call_command(
+                'import_posts', self.path('new.ndjson'), batch_size=2,
+                stdout=StringIO()
+            )
+        imported = Post.objects.filter(text__startswith='импортированный')
+        self.assertEqual(
+            {post.pub_date.year for post in imported}, {2020}
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 8
+        )
+        self.assertEqual(Group.objects.get().posts_count, 5)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=reader, post__in=imported).count(),
+            3
+        )
+        self.assertEqual(
+            set(ChangeLog.objects.filter(
+                model='post', action=ChangeLog.CREATE
+            ).values_list('object_id', flat=True)),
+            set(imported.values_list('pk', flat=True))
+        )
+        self.assertEqual(len(find_posts('импортированный')), 3)
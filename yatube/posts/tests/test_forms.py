@@ -1,12 +1,18 @@
 import shutil
 import tempfile
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.core.files.uploadhandler import StopUpload
+from django.test import Client, RequestFactory, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image, ImageFile
 
+from ..forms import PostForm
 from ..models import Post, Group, User, Comment, Follow
+from ..uploads import LimitedTemporaryFileUploadHandler
 
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -217,3 +223,98 @@ class PostsFormsTest(TestCase):
         )
         new_count = Follow.objects.count()
         self.assertEqual(new_count, foll_count - 1)
+
+
+def make_jpeg(size=(64, 64), image_format='JPEG'):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'teal').save(buffer, image_format)
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostImageLimitsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='uploader')
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def form_errors(self, content):
+        form = PostForm(
+            data={'text': 'с картинкой'},
+            files={'image': SimpleUploadedFile(
+                'photo.jpg', content, content_type='image/jpeg'
+            )}
+        )
+        self.assertFalse(form.is_valid())
+        return [error.code for error in form.errors.as_data()['image']]
+
+    def test_valid_jpeg_accepted(self):
+        form = PostForm(
+            data={'text': 'с картинкой'},
+            files={'image': SimpleUploadedFile(
+                'photo.jpg', make_jpeg(), content_type='image/jpeg'
+            )}
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+
+    @override_settings(POST_IMAGE_MAX_SIZE=100)
+    def test_file_too_large(self):
+        self.assertEqual(self.form_errors(make_jpeg()), ['file_too_large'])
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=64 * 64 - 1)
+    def test_too_many_pixels(self):
+        self.assertEqual(self.form_errors(make_jpeg()), ['too_many_pixels'])
+
+    def test_truncated_image(self):
+        """Обрезанный JPEG проходит verify(), но не декодируется."""
+        content = make_jpeg((256, 256))
+        self.assertEqual(
+            self.form_errors(content[:len(content) // 2]), ['invalid_image']
+        )
+
+    @override_settings(POST_IMAGE_MAX_SIZE=400)
+    def test_oversized_upload_rejected_by_view(self):
+        """Обрезанная обработчиком загрузка отклоняется из-за размера."""
+        posts_count = Post.objects.count()
+        response = self.client.post(reverse('posts:post_create'), {
+            'text': 'слишком большая картинка',
+            'image': SimpleUploadedFile(
+                'photo.jpg', make_jpeg(), content_type='image/jpeg'
+            ),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].has_error(
+            'image', 'file_too_large'
+        ))
+        self.assertEqual(Post.objects.count(), posts_count)
+
+    def test_png_is_not_decoded(self):
+        """PNG проверяется verify() без распаковки пикселей."""
+        form = PostForm(
+            data={'text': 'с картинкой'},
+            files={'image': SimpleUploadedFile(
+                'photo.png', make_jpeg(image_format='PNG'),
+                content_type='image/png'
+            )}
+        )
+        with mock.patch.object(
+            ImageFile.ImageFile, 'load', autospec=True
+        ) as load:
+            self.assertTrue(form.is_valid(), form.errors)
+        load.assert_not_called()
+
+    @override_settings(POST_IMAGE_MAX_SIZE=20)
+    def test_handler_stops_upload_past_limit(self):
+        """Сверх лимита обработчик обрывает разбор запроса."""
+        request = RequestFactory().post('/')
+        handler = LimitedTemporaryFileUploadHandler(request)
+        handler.new_file('image', 'big.jpg', 'image/jpeg', None)
+        handler.receive_data_chunk(b'x' * 16, 0)
+        with self.assertRaises(StopUpload) as stop:
+            handler.receive_data_chunk(b'x' * 16, 16)
+        self.assertTrue(stop.exception.connection_reset)
+        self.assertEqual(request.oversized_uploads, {'image'})
+        handler.file.close()
@@ -1,5 +1,12 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
-from ..models import Group, Post, User, Comment, Follow
+from django.utils import timezone
+
+from ..bulk import bulk_create
+from ..models import Group, Post, User, Comment, Follow, UserStats
 
 
 class PostModelTest(TestCase):
@@ -112,3 +119,90 @@ class PostModelTest(TestCase):
         for parametr, value in help_text_dict.items():
             with self.subTest(parametr=parametr):
                 self.assertEqual(parametr, value)
+
+    def test_save_refreshes_updated(self):
+        """save() ставит updated, bulk_create оставляет заданную дату."""
+        past = timezone.now() - timedelta(days=1)
+        post = Post.objects.create(
+            text='пост', author=self.author, updated=past
+        )
+        self.assertGreater(post.updated, past)
+        imported, = bulk_create(
+            Post, [Post(text='из выгрузки', author=self.author,
+                        pub_date=past, updated=past)],
+            keep_dates=['pub_date']
+        )
+        imported.refresh_from_db()
+        self.assertEqual((imported.pub_date, imported.updated), (past, past))
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.group_one = Group.objects.create(
+            title='первая', slug='first', description='описание'
+        )
+        cls.group_two = Group.objects.create(
+            title='вторая', slug='second', description='описание'
+        )
+
+    def assertCounters(self, author_posts, first, second, followers):
+        stats = UserStats.objects.get(user=self.author)
+        self.group_one.refresh_from_db()
+        self.group_two.refresh_from_db()
+        self.assertEqual(stats.posts_count, author_posts)
+        self.assertEqual(stats.followers_count, followers)
+        self.assertEqual(self.group_one.posts_count, first)
+        self.assertEqual(self.group_two.posts_count, second)
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются вместе с постами, комментариями и подписками."""
+        post = Post.objects.create(
+            text='пост', author=self.author, group=self.group_one
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='ок')
+        self.assertCounters(1, 1, 0, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 1
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        post = Post.objects.get(pk=post.pk)
+        post.group = self.group_two
+        post.save()
+        self.assertCounters(1, 0, 1, 1)
+        Follow.objects.all().delete()
+        post.delete()
+        self.assertCounters(0, 0, 0, 0)
+
+    def test_delete_user_with_posts_and_follows(self):
+        """Удаление пользователя не создаёт UserStats для него."""
+        user = User.objects.create_user(username='leaving')
+        Post.objects.create(text='пост', author=user, group=self.group_one)
+        Follow.objects.create(user=user, author=self.author)
+        Follow.objects.create(user=self.reader, author=user)
+        user_id = user.pk
+        user.delete()
+        self.assertFalse(UserStats.objects.filter(user_id=user_id).exists())
+        self.assertCounters(0, 0, 0, 0)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 0
+        )
+
+    def test_rebuild_counters(self):
+        """rebuild_counters восстанавливает счётчики после bulk_create."""
+        Post.objects.bulk_create(
+            Post(text=f'пост {number}', author=self.author,
+                 group=self.group_two)
+            for number in range(3)
+        )
+        Follow.objects.bulk_create(
+            [Follow(user=self.reader, author=self.author)]
+        )
+        UserStats.objects.all().delete()
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertCounters(3, 0, 3, 1)
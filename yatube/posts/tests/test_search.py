@@ -0,0 +1,120 @@
+from unittest import skipUnless
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post, SearchStats, SearchTerm, User
+from ..search import (
+    LENGTH_TERM, find_posts, fts5_supported, rebuild_index
+)
+
+
+class SearchTestMixin:
+    """Общие проверки для обоих бэкендов поиска."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='writer')
+        cls.short = Post.objects.create(
+            text='Кот спит на окне', author=cls.author
+        )
+        cls.long = Post.objects.create(
+            text='Собака лает, а кот в это время спокойно ест '
+                 'из своей миски и совсем не обращает внимания',
+            author=cls.author
+        )
+        cls.other = Post.objects.create(
+            text='Про <b>собак</b> и больше ничего', author=cls.author
+        )
+
+    def found(self, query):
+        results = find_posts(query)
+        return [post.pk for post in results[0:results.count()]]
+
+    def test_ranked_results(self):
+        """Короткий пост с тем же словом релевантнее длинного."""
+        self.assertEqual(self.found('КОТ'), [self.short.pk, self.long.pk])
+        self.assertEqual(self.found('кот собака'), [self.long.pk])
+        self.assertEqual(self.found('жираф'), [])
+        self.assertIsNone(find_posts(' ,. '))
+
+    def test_index_follows_edit_and_delete(self):
+        post = Post.objects.get(pk=self.short.pk)
+        post.text = 'Теперь здесь про жирафа'
+        post.save()
+        self.assertEqual(self.found('кот'), [self.long.pk])
+        self.assertEqual(self.found('жирафа'), [self.short.pk])
+        Post.objects.get(pk=self.long.pk).delete()
+        self.assertEqual(self.found('кот'), [])
+
+    def test_rebuild_index(self):
+        Post.objects.filter(pk=self.short.pk).update(text='жираф')
+        rebuild_index()
+        self.assertEqual(self.found('жираф'), [self.short.pk])
+        self.assertEqual(self.found('кот'), [self.long.pk])
+
+    def test_snippet_is_escaped_and_highlighted(self):
+        post = find_posts('собак')[0]
+        self.assertIn('<mark>собак</mark>', post.snippet)
+        self.assertIn('&lt;b&gt;', post.snippet)
+
+    def test_search_view(self):
+        for number in range(12):
+            Post.objects.create(text=f'кот номер {number}', author=self.author)
+        response = self.client.get(reverse('posts:search'), {'q': 'кот'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, 14)
+        self.assertEqual(len(page_obj), 10)
+        self.assertContains(response, '?q=%D0%BA%D0%BE%D1%82&amp;page=2')
+        self.assertContains(response, '<mark>')
+        second = self.client.get(
+            reverse('posts:search'), {'q': 'кот', 'page': 2}
+        )
+        self.assertEqual(len(second.context['page_obj']), 4)
+
+    def test_words_split_like_fts5(self):
+        """Оба бэкенда делят слова и снимают диакритику одинаково."""
+        post = Post.objects.create(
+            text='snake_case и Café', author=self.author
+        )
+        self.assertEqual(self.found('snake'), [post.pk])
+        self.assertEqual(self.found('case cafe'), [post.pk])
+        self.assertEqual(self.found('snake_case'), [post.pk])
+        self.assertIn('<mark>Café</mark>', find_posts('cafe')[0].snippet)
+
+    def test_empty_query(self):
+        response = self.client.get(reverse('posts:search'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['page_obj'])
+
+
+@override_settings(POST_SEARCH_BACKEND='python')
+class PythonSearchTest(SearchTestMixin, TestCase):
+    def assertStatsMatchIndex(self):
+        lengths = SearchTerm.objects.filter(
+            term=LENGTH_TERM
+        ).values_list('frequency', flat=True)
+        stats = SearchStats.objects.get()
+        self.assertEqual(stats.documents, len(lengths))
+        self.assertEqual(stats.total_length, sum(lengths))
+
+    def test_stats_follow_index(self):
+        """Размер корпуса для BM25 берётся из SearchStats без агрегатов."""
+        self.assertStatsMatchIndex()
+        post = Post.objects.get(pk=self.short.pk)
+        post.text = 'Кот спит на окне и видит сны'
+        post.save()
+        self.assertStatsMatchIndex()
+        self.author.posts.filter(pk=self.long.pk).delete()
+        self.assertStatsMatchIndex()
+        rebuild_index()
+        self.assertStatsMatchIndex()
+        results = find_posts('кот')
+        with self.assertNumQueries(3):
+            results.count()
+
+
+@skipUnless(fts5_supported(), 'SQLite собран без FTS5')
+@override_settings(POST_SEARCH_BACKEND='fts5')
+class Fts5SearchTest(SearchTestMixin, TestCase):
+    pass
@@ -0,0 +1,190 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from sorl.thumbnail.base import EXTENSIONS
+
+from .. import thumbnails
+from ..models import ImageDerivatives, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='photographer')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='пост с картинкой',
+            author=self.author,
+            image=SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif'
+            )
+        )
+
+    def test_schedule_builds_thumbnail(self):
+        """schedule строит производные, которые потом найдёт лента."""
+        self.assertIsNone(thumbnails.cached_thumbnail(self.post.image))
+        thumbnails.schedule(self.post)
+        thumbnail = thumbnails.cached_thumbnail(self.post.image)
+        self.assertIsNotNone(thumbnail)
+        self.assertEqual(
+            set(thumbnail.files), set(thumbnails.DERIVATIVES)
+        )
+        for (width, image_format), file in thumbnail.files.items():
+            with self.subTest(width=width, image_format=image_format):
+                self.assertTrue(file.exists())
+                self.assertEqual(file.width, width)
+                self.assertTrue(
+                    file.name.endswith(EXTENSIONS[image_format])
+                )
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, f'src="{thumbnail.url}"')
+        self.assertContains(response, f'srcset="{thumbnail.srcset}"')
+
+    def test_detail_sizes_match_column(self):
+        """На странице поста sizes описывает узкую боковую колонку."""
+        thumbnails.schedule(self.post)
+        response = Client().get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        self.assertContains(response, 'sizes="(max-width: 767px) 100vw, 25vw"')
+        self.assertNotContains(response, '960px')
+
+    @skipUnless('WEBP' in thumbnails.FORMATS, 'Pillow собран без WebP')
+    def test_webp_source(self):
+        """При поддержке WebP карточка предлагает его через <source>."""
+        thumbnails.schedule(self.post)
+        thumbnail = thumbnails.cached_thumbnail(self.post.image)
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(
+            response,
+            f'<source type="image/webp" srcset="{thumbnail.webp_srcset}"'
+        )
+
+    def test_original_shown_while_pending(self):
+        """Пока миниатюра строится, в ленте остаётся оригинал."""
+        thumbnails._pending.add(self.post.image.name)
+        try:
+            response = Client().get(reverse('posts:index'))
+        finally:
+            thumbnails._pending.discard(self.post.image.name)
+        self.assertContains(response, self.post.image.url)
+        self.assertIsNone(thumbnails.cached_thumbnail(self.post.image))
+
+    def test_feed_does_not_build_thumbnails(self):
+        """Лента без пула потоков не строит миниатюры в запросе."""
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, self.post.image.url)
+        self.assertIsNone(thumbnails.cached_thumbnail(self.post.image))
+
+    def test_build_thumbnails_command(self):
+        """build_thumbnails достраивает только недостающие наборы."""
+        out = StringIO()
+        call_command('build_thumbnails', stdout=out)
+        self.assertIn('Построено наборов: 1', out.getvalue())
+        self.assertIsNotNone(thumbnails.cached_thumbnail(self.post.image))
+        out = StringIO()
+        call_command('build_thumbnails', stdout=out)
+        self.assertIn('Построено наборов: 0', out.getvalue())
+
+    def test_ready_thumbnail_replaces_original_in_cached_feed(self):
+        """Готовая миниатюра сбрасывает закешированную ленту."""
+        thumbnails._pending.add(self.post.image.name)
+        try:
+            Client().get(reverse('posts:index'))
+        finally:
+            thumbnails._pending.discard(self.post.image.name)
+        thumbnails.schedule(self.post)
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(
+            response, thumbnails.cached_thumbnail(self.post.image).url
+        )
+        self.assertNotContains(response, self.post.image.url)
+
+    def test_feed_page_prefetches_thumbnails(self):
+        """Миниатюры страницы читаются из хранилища одним запросом."""
+        posts = [self.post] + [
+            Post.objects.create(
+                text=f'ещё пост {number}',
+                author=self.author,
+                image=SimpleUploadedFile(
+                    f'more_{number}.gif', SMALL_GIF, content_type='image/gif'
+                )
+            )
+            for number in range(3)
+        ]
+        for post in posts:
+            thumbnails.schedule(post)
+        cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            response = Client().get(reverse('posts:index'))
+        derivative_queries = [
+            query for query in captured
+            if ImageDerivatives._meta.db_table in query['sql']
+        ]
+        self.assertEqual(len(derivative_queries), 1)
+        for post in posts:
+            self.assertContains(
+                response, thumbnails.cached_thumbnail(post.image).url
+            )
+
+    def test_failed_image_is_not_rescheduled(self):
+        """Битая картинка запоминается и не ставится в очередь с лентой."""
+        broken = Post.objects.create(
+            text='битая картинка',
+            author=self.author,
+            image=SimpleUploadedFile(
+                'broken.gif', b'not an image', content_type='image/gif'
+            )
+        )
+        with self.assertLogs(level='ERROR'):
+            thumbnails.schedule(broken)
+        self.assertTrue(
+            ImageDerivatives.objects.get(image=broken.image.name).failed
+        )
+        with override_settings(THUMBNAIL_WORKERS=2), mock.patch(
+            'posts.templatetags.post_images.schedule'
+        ) as schedule, mock.patch(
+            'posts.templatetags.post_images.transaction.on_commit',
+            side_effect=lambda func: func()
+        ):
+            response = Client().get(reverse('posts:index'))
+        self.assertContains(response, broken.image.url)
+        scheduled = [call.args[0] for call in schedule.call_args_list]
+        self.assertIn(self.post, scheduled)
+        self.assertNotIn(broken, scheduled)
+        out = StringIO()
+        call_command('build_thumbnails', stdout=out)
+        self.assertIn('Построено наборов: 1', out.getvalue())
+        out = StringIO()
+        with self.assertLogs(level='ERROR'):
+            call_command('build_thumbnails', retry_failed=True, stdout=out)
+        self.assertIn('Построено наборов: 1', out.getvalue())
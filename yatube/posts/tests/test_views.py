@@ -1,14 +1,21 @@
 import shutil
 import tempfile
 
-from django.test import Client, TestCase, override_settings
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
 from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
 
+from .. import timeline
+from ..caching import invalidate
 from ..forms import PostForm
-from ..models import Follow, Post, Group, User, Comment
+from ..models import FeedEntry, Follow, Post, Group, User, Comment
+from ..utils import comments_url
 from yatube.settings import P_ON_PAGE
 
 
@@ -119,14 +126,55 @@ class PostsViewsTest(TestCase):
         cache.clear()
         response = self.authorized_client.get(reverse('posts:index'))
         cache_check = response.content
-        post = Post.objects.get(id=self.post.id)
-        post.delete()
+        Post.objects.filter(id=self.post.id).update(text='без сигналов')
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(response.content, cache_check)
         cache.clear()
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(response.content, cache_check)
 
+    def test_writes_invalidate_cached_feeds(self):
+        """Изменение поста сразу сбрасывает кеш связанных лент."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                cache_check = self.authorized_client.get(url).content
+                post = Post.objects.get(id=self.post.id)
+                post.text = f'правка для {url}'
+                post.save()
+                response = self.authorized_client.get(url)
+                self.assertNotEqual(response.content, cache_check)
+                self.assertContains(response, post.text)
+
+    def test_other_group_cache_survives_write(self):
+        """Запись в одну группу не сбрасывает кеш другой."""
+        url = reverse('posts:group_list', kwargs={'slug': 'some_slug'})
+        cache_check = self.authorized_client.get(url).content
+        Post.objects.filter(id=self.post.id).update(group=self.group_two)
+        Post.objects.create(
+            text='новый', author=self.author, group=self.group_one
+        )
+        response = self.authorized_client.get(url)
+        self.assertEqual(response.content, cache_check)
+
+    def test_post_card_fragment_cache(self):
+        """Карточка поста берётся из кеша, пока не изменится updated."""
+        url = reverse('posts:profile', kwargs={'username': self.author})
+        self.authorized_client.get(url)
+        Post.objects.filter(id=self.post.id).update(text='без сигналов')
+        invalidate(f'author:{self.author.username}')
+        response = self.authorized_client.get(url)
+        self.assertContains(response, self.post.text)
+        self.assertNotContains(response, 'без сигналов')
+        post = Post.objects.get(id=self.post.id)
+        post.save()
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'без сигналов')
+
     def test_correct_context_group_list(self):
         """Проверка контекста на странице с постами группы."""
         response = self.authorized_client.get(
@@ -249,3 +297,391 @@ class PaginatorTest(TestCase):
                 self.assertEqual(
                     len(response.context['page_obj']), quantity
                 )
+
+
+@override_settings(FEED_PAGINATION='cursor')
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Alex')
+        cls.group = Group.objects.create(
+            title='название',
+            slug='test_slug',
+            description='тестовое описание'
+        )
+        cls.batch_size = P_ON_PAGE * 2 + 3
+        Post.objects.bulk_create(Post(
+            text=f'тестовый пост номер: {number}',
+            author=cls.user,
+            group=cls.group
+        ) for number in range(cls.batch_size))
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=('test_slug',)),
+            reverse('posts:profile', args=(cls.user,)),
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def walk(self, url):
+        """Обходит ленту по курсорам до конца и возвращает страницы."""
+        pages = []
+        cursor = ''
+        while cursor is not None:
+            response = self.guest_client.get(url, {'cursor': cursor})
+            page_obj = response.context['page_obj']
+            pages.append(page_obj)
+            cursor = page_obj.next_cursor
+        return pages
+
+    def test_cursor_walk_covers_feed(self):
+        """Курсоры обходят всю ленту без пропусков и повторов."""
+        expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True
+            )
+        )
+        for url in self.urls:
+            with self.subTest(url=url):
+                pages = self.walk(url)
+                self.assertEqual(
+                    [len(page) for page in pages],
+                    [P_ON_PAGE, P_ON_PAGE, self.batch_size - 2 * P_ON_PAGE]
+                )
+                seen = [post.pk for page in pages for post in page]
+                self.assertEqual(seen, expected)
+                self.assertFalse(pages[0].has_previous())
+                self.assertFalse(pages[-1].has_next())
+
+    def test_previous_cursor_returns_previous_page(self):
+        """Курсор назад возвращает ту же страницу, что и при обходе."""
+        url = reverse('posts:index')
+        first, second, third = self.walk(url)
+        response = self.guest_client.get(
+            url, {'cursor': third.previous_cursor}
+        )
+        self.assertEqual(list(response.context['page_obj']), list(second))
+        response = self.guest_client.get(
+            url, {'cursor': second.previous_cursor}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(list(page_obj), list(first))
+        self.assertFalse(page_obj.has_previous())
+
+    def test_cursor_page_has_no_count_query(self):
+        """Курсорная страница не выполняет COUNT."""
+        url = reverse('posts:group_list', args=('test_slug',))
+        second_cursor = self.walk(url)[1].next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(url, {'cursor': second_cursor})
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries)
+        )
+
+    def test_invalid_cursor_opens_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': 'garbage!'}
+        )
+        self.assertEqual(len(response.context['page_obj']), P_ON_PAGE)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.follower = User.objects.create_user(username='follower')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='название',
+            slug='test_slug',
+            description='тестовое описание'
+        )
+        Follow.objects.create(user=cls.follower, author=cls.author)
+        cls.feeds = (
+            (reverse('posts:index'), 4),
+            (reverse('posts:group_list', args=('test_slug',)), 5),
+            (reverse('posts:profile', args=(cls.author,)), 6),
+            # +1 запрос за авторов подписок для ETag
+            (reverse('posts:follow_index'), 5),
+        )
+
+    def setUp(self):
+        self.follower_client = Client()
+        self.follower_client.force_login(FeedQueriesTest.follower)
+
+    def add_posts(self, amount):
+        Post.objects.bulk_create(Post(
+            text=f'тестовый пост {number}',
+            author=self.author,
+            group=self.group
+        ) for number in range(amount))
+
+    def test_feed_query_count_does_not_depend_on_page_size(self):
+        """Число запросов ленты не растёт с количеством постов."""
+        for amount in (1, P_ON_PAGE):
+            self.add_posts(amount)
+            for url, queries in self.feeds:
+                with self.subTest(url=url, amount=amount):
+                    cache.clear()
+                    with self.assertNumQueries(queries):
+                        response = self.follower_client.get(url)
+                    self.assertContains(response, 'тестовый пост')
+
+
+@override_settings(FOLLOW_FEED_FANOUT=True)
+class FanOutTimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.old_post = Post.objects.create(text='старый', author=cls.author)
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(FanOutTimelineTest.reader)
+        self.author_client = Client()
+        self.author_client.force_login(FanOutTimelineTest.author)
+
+    def feed(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_timeline_follows_writes(self):
+        """Лента заполняется при подписке и публикации, чистится отпиской."""
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=(self.author,))
+        )
+        self.assertEqual(self.feed(), [self.old_post])
+        self.author_client.post(
+            reverse('posts:post_create'), {'text': 'новый'}
+        )
+        new_post = Post.objects.get(text='новый')
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=(self.author,))
+        )
+        self.assertEqual(self.feed(), [])
+        self.assertFalse(FeedEntry.objects.exists())
+
+    def test_feed_reads_timeline_table(self):
+        """Лента подписок читается из FeedEntry, а не через Follow."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.feed(), [self.old_post])
+        feed_sql = queries[-1]['sql']
+        self.assertIn('posts_feedentry', feed_sql)
+        self.assertNotIn('posts_follow', feed_sql)
+        # Сортировка по дате из FeedEntry идёт по индексу (user, pub_date)
+        self.assertIn('"posts_feedentry"."pub_date" AS "feed_date"', feed_sql)
+        self.assertIn('ORDER BY "feed_date" DESC', feed_sql)
+
+
+@override_settings(
+    FOLLOW_FEED_FANOUT=True, FOLLOW_FEED_CELEBRITY_THRESHOLD=2, P_ON_PAGE=3
+)
+class HybridTimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.fan = User.objects.create_user(username='fan')
+        cls.star = User.objects.create_user(username='star')
+        cls.author = User.objects.create_user(username='writer')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.star)
+        Follow.objects.create(user=cls.fan, author=cls.star)
+        for number in range(4):
+            Post.objects.create(text=f'обычный {number}', author=cls.author)
+            Post.objects.create(text=f'звёздный {number}', author=cls.star)
+        cls.expected = list(Post.objects.order_by('-pub_date', '-pk'))
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(HybridTimelineTest.reader)
+
+    def walk(self):
+        posts, cursor = [], ''
+        while cursor is not None:
+            response = self.reader_client.get(
+                reverse('posts:follow_index'), {'cursor': cursor}
+            )
+            page_obj = response.context['page_obj']
+            posts.extend(page_obj)
+            cursor = page_obj.next_cursor
+        return posts
+
+    def test_star_posts_are_not_fanned_out(self):
+        """Посты автора выше порога не пишутся в ленты подписчиков."""
+        self.assertFalse(
+            FeedEntry.objects.filter(post__author=self.star).exists()
+        )
+        self.assertEqual(FeedEntry.objects.count(), 4)
+
+    def test_feed_merges_star_posts(self):
+        """Лента подписок сливает свою ленту и посты «звёзд»."""
+        posts = []
+        for page in (1, 2, 3):
+            response = self.reader_client.get(
+                reverse('posts:follow_index'), {'page': page}
+            )
+            posts.extend(response.context['page_obj'])
+        self.assertEqual(posts, self.expected)
+        with override_settings(FEED_PAGINATION='cursor'):
+            self.assertEqual(self.walk(), self.expected)
+
+    def test_demoted_star_posts_wait_for_commit(self):
+        """Раздача постов бывшей «звезды» не идёт внутри отписки."""
+        Follow.objects.filter(user=self.fan).delete()
+        self.assertFalse(
+            FeedEntry.objects.filter(post__author=self.star).exists()
+        )
+
+
+@override_settings(
+    FOLLOW_FEED_FANOUT=True, FOLLOW_FEED_CELEBRITY_THRESHOLD=2,
+    FOLLOW_FEED_WORKERS=0, P_ON_PAGE=3, FEED_PAGINATION='cursor'
+)
+class DemotedStarTimelineTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader')
+        self.fan = User.objects.create_user(username='fan')
+        self.star = User.objects.create_user(username='star')
+        Follow.objects.create(user=self.reader, author=self.star)
+        Follow.objects.create(user=self.fan, author=self.star)
+        self.posts = [
+            Post.objects.create(text=f'звёздный {number}', author=self.star)
+            for number in range(4)
+        ]
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_demoted_star_fan_out_refreshes_feed(self):
+        """После раздачи постов бывшей «звезды» лента не отдаёт 304."""
+        url = reverse('posts:follow_index')
+        Follow.objects.filter(user=self.fan).delete()
+        FeedEntry.objects.all().delete()
+        first = self.reader_client.get(url)
+        timeline.fan_out_demoted(self.star.pk)
+        response = self.reader_client.get(
+            url, HTTP_IF_NONE_MATCH=first['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_demoted_star_posts_are_fanned_out(self):
+        """Когда автор опускается ниже порога, его посты раздаются."""
+        with transaction.atomic():
+            Follow.objects.filter(user=self.fan).delete()
+            self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 4
+        )
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        second = self.reader_client.get(
+            reverse('posts:follow_index'),
+            {'cursor': response.context['page_obj'].next_cursor}
+        )
+        self.assertEqual(
+            list(response.context['page_obj'])
+            + list(second.context['page_obj']),
+            self.posts[::-1]
+        )
+
+
+@override_settings(COMMENTS_ON_PAGE=5)
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='пост', author=cls.author)
+        cls.readers = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(3)
+        ]
+
+    def add_comments(self, amount):
+        for number in range(amount):
+            Comment.objects.create(
+                post=self.post, author=self.readers[number % 3],
+                text=f'комментарий {Comment.objects.count()}'
+            )
+
+    def texts(self, page):
+        return [comment.text for comment in page]
+
+    def test_post_detail_shows_first_page(self):
+        """Под постом первые комментарии, от старых к новым."""
+        self.add_comments(7)
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        )
+        page = response.context['comments']
+        self.assertEqual(
+            self.texts(page), [f'комментарий {n}' for n in range(5)]
+        )
+        self.assertContains(
+            response, reverse('posts:post_comments', args=(self.post.pk,))
+        )
+
+    def test_load_more_fragment(self):
+        """«Ещё» отдаёт следующую страницу фрагментом без разметки base."""
+        self.add_comments(7)
+        first = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        ).context['comments']
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.pk,)),
+            {'cursor': first.next_cursor}
+        )
+        self.assertEqual(
+            self.texts(response.context['comments']),
+            ['комментарий 5', 'комментарий 6']
+        )
+        self.assertNotContains(response, '<html')
+        self.assertNotContains(response, 'Ещё комментарии')
+
+    def test_query_count_does_not_depend_on_comments(self):
+        """Авторы комментариев не дают N+1."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        counts = []
+        for amount in (1, 10):
+            self.add_comments(amount)
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_missing_post(self):
+        response = self.client.get(
+            reverse('posts:post_comments', args=(0,))
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_new_comment_opens_its_page(self):
+        """После отправки автор попадает на страницу со своим комментарием."""
+        self.add_comments(12)
+        self.client.force_login(self.readers[0])
+        response = self.client.post(
+            reverse('posts:add_comment', args=(self.post.pk,)),
+            {'text': 'мой комментарий'}
+        )
+        comment = Comment.objects.get(text='мой комментарий')
+        self.assertTrue(response.url.endswith(f'#comment-{comment.pk}'))
+        page = self.client.get(response.url)
+        self.assertEqual(
+            self.texts(page.context['comments']),
+            [f'комментарий {n}' for n in range(8, 12)] + ['мой комментарий']
+        )
+        self.assertContains(page, f'id="comment-{comment.pk}"')
+        last = self.client.get(comments_url(self.post))
+        self.assertEqual(
+            self.texts(last.context['comments']),
+            [f'комментарий {n}' for n in range(8, 12)] + ['мой комментарий']
+        )
@@ -0,0 +1,134 @@
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import write_queue
+from ..models import ChangeLog, Comment, Follow, Post, User, UserStats
+
+
+@override_settings(
+    WRITE_BEHIND=True,
+    CHANGE_LOG_CONSUMERS=['posts.changelog.LoggingConsumer']
+)
+class WriteQueueTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='пост автора', author=cls.author)
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        queue_path = override_settings(
+            WRITE_QUEUE_PATH=os.path.join(directory, 'queue.sqlite3')
+        )
+        queue_path.enable()
+        self.addCleanup(queue_path.disable)
+        self.addCleanup(write_queue.close)
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def follow(self):
+        self.client.get(reverse('posts:profile_follow', args=('author',)))
+
+    def unfollow(self):
+        self.client.get(reverse('posts:profile_unfollow', args=('author',)))
+
+    def test_comment_is_visible_to_its_author_before_apply(self):
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        self.client.post(
+            reverse('posts:add_comment', args=(self.post.pk,)),
+            {'text': 'из очереди'}
+        )
+        self.assertFalse(Comment.objects.exists())
+        self.assertContains(self.client.get(url), 'из очереди')
+        self.assertNotContains(Client().get(url), 'из очереди')
+        self.assertEqual(write_queue.apply_all(), 1)
+        comment = Comment.objects.get()
+        self.assertEqual(
+            (comment.author, comment.text), (self.reader, 'из очереди')
+        )
+        self.assertEqual(Post.objects.get(pk=self.post.pk).comments_count, 1)
+        self.assertTrue(ChangeLog.objects.filter(
+            model='comment', object_id=comment.pk
+        ).exists())
+        self.assertContains(self.client.get(url), 'из очереди', count=1)
+
+    def test_follow_is_visible_before_apply(self):
+        profile = reverse('posts:profile', args=('author',))
+        self.client.get(profile)
+        self.follow()
+        self.assertFalse(Follow.objects.exists())
+        self.assertTrue(self.client.get(profile).context['following'])
+        feed = self.client.get(reverse('posts:follow_index'))
+        self.assertContains(feed, 'пост автора')
+        write_queue.apply_all()
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=self.author)
+            .exists()
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1
+        )
+        self.unfollow()
+        self.assertFalse(self.client.get(profile).context['following'])
+        self.assertNotContains(
+            self.client.get(reverse('posts:follow_index')), 'пост автора'
+        )
+        write_queue.apply_all()
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 0
+        )
+
+    def test_batch_keeps_last_action_per_pair(self):
+        self.follow()
+        self.unfollow()
+        self.follow()
+        self.assertEqual(write_queue.apply_batch(), 3)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(write_queue.apply_batch(), 0)
+
+    def test_batches_are_applied_once(self):
+        for number in range(3):
+            write_queue.enqueue(
+                self.reader.pk, write_queue.COMMENT, self.post.pk,
+                f'комментарий {number}'
+            )
+        self.assertEqual(write_queue.apply_batch(limit=2), 2)
+        self.assertEqual(write_queue.apply_batch(limit=2), 1)
+        self.assertEqual(write_queue.apply_all(), 0)
+        texts = Comment.objects.order_by('pk').values_list('text', flat=True)
+        self.assertEqual(
+            list(texts), ['комментарий 0', 'комментарий 1', 'комментарий 2']
+        )
+
+    def test_deleted_post_is_skipped(self):
+        post = Post.objects.create(text='удалится', author=self.author)
+        write_queue.enqueue(self.reader.pk, write_queue.COMMENT, post.pk, 'х')
+        post.delete()
+        self.assertEqual(write_queue.apply_all(), 1)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_comment_keeps_queued_time(self):
+        """Комментарий получает время действия, а не применения очереди."""
+        queued = datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        with mock.patch.object(
+            write_queue.time, 'time', return_value=queued.timestamp()
+        ):
+            write_queue.enqueue(
+                self.reader.pk, write_queue.COMMENT, self.post.pk, 'давно'
+            )
+        write_queue.apply_all()
+        self.assertEqual(Comment.objects.get().created, queued)
+        fresh = Comment.objects.create(
+            post=self.post, author=self.reader, text='сейчас'
+        )
+        self.assertGreater(fresh.created, queued)
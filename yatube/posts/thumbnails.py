@@ -0,0 +1,205 @@
+"""Фоновая подготовка миниатюр для карточек постов.
+
+Для каждой картинки строится набор производных с пропорциями 960x339:
+несколько ширин в JPEG и, если Pillow собран с libwebp, в WebP.
+Набор строится после сохранения поста через PostForm в пуле из
+THUMBNAIL_WORKERS потоков; при THUMBNAIL_WORKERS = 0 — в самом запросе
+на запись. Пока набор не готов, карточка показывает оригинал; для
+постов, созданных в обход формы, его достраивает manage.py
+build_thumbnails.
+
+Миниатюры строит публичный API sorl (default.backend.get_thumbnail), а
+имена готовых файлов — или то, что картинку построить не удалось, —
+записываются в ImageDerivatives. Картинка с ошибкой больше в очередь
+не ставится, её повторяет build_thumbnails --retry-failed.
+"""
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from PIL import features
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from .caching import author_scopes, group_scopes, invalidate
+from .models import ImageDerivatives
+
+logger = logging.getLogger(__name__)
+
+FEED_WIDTH, FEED_HEIGHT = 960, 339
+FEED_OPTIONS = {'crop': 'center', 'upscale': True}
+WIDTHS = (480, 960, 1440)
+FORMATS = ('JPEG', 'WEBP') if features.check('webp') else ('JPEG',)
+DERIVATIVES = tuple(
+    (width, image_format) for image_format in FORMATS for width in WIDTHS
+)
+CACHE_KEY = 'image-derivatives:{}'
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def geometry(width):
+    return f'{width}x{round(width * FEED_HEIGHT / FEED_WIDTH)}'
+
+
+class Derivatives:
+    """Набор производных одной картинки; failed — построить не удалось."""
+
+    def __init__(self, files, failed=False):
+        self.files = files
+        self.failed = failed
+
+    @property
+    def url(self):
+        return self.files[FEED_WIDTH, 'JPEG'].url
+
+    def _srcset(self, image_format):
+        return ', '.join(
+            f'{self.files[width, image_format].url} {width}w'
+            for width in WIDTHS if (width, image_format) in self.files
+        )
+
+    @property
+    def srcset(self):
+        return self._srcset('JPEG')
+
+    @property
+    def webp_srcset(self):
+        return self._srcset('WEBP')
+
+
+def _cache_key(name):
+    return CACHE_KEY.format(hashlib.md5(name.encode()).hexdigest())
+
+
+def _derivatives(files, failed):
+    if failed:
+        return Derivatives({}, failed=True)
+    if not files:
+        return None
+    found = {}
+    for width, image_format, name, size in json.loads(files):
+        image = ImageFile(name, default.storage)
+        image.set_size(size)
+        found[width, image_format] = image
+    return Derivatives(found)
+
+
+def cached_thumbnails(images):
+    """Производные для нескольких картинок за одно обращение.
+
+    Возвращает словарь: имя картинки -> Derivatives или None, если
+    набор ещё не построен. Сначала читается кеш, недостающее — одним
+    запросом к ImageDerivatives.
+    """
+    keys = {_cache_key(image.name): image.name for image in images if image}
+    values = cache.get_many(keys)
+    missing = {keys[key] for key in keys if key not in values}
+    if missing:
+        found = {
+            image: (files, failed)
+            for image, files, failed in ImageDerivatives.objects.filter(
+                image__in=missing
+            ).values_list('image', 'files', 'failed')
+        }
+        loaded = {
+            _cache_key(name): found.get(name, ('', False))
+            for name in missing
+        }
+        cache.set_many(loaded)
+        values.update(loaded)
+    return {
+        name: _derivatives(*values[key]) for key, name in keys.items()
+    }
+
+
+def cached_thumbnail(image):
+    """Производные одной картинки или None."""
+    return cached_thumbnails([image]).get(image.name)
+
+
+def _record(name, files='', failed=False):
+    ImageDerivatives.objects.update_or_create(
+        image=name, defaults={'files': files, 'failed': failed}
+    )
+    cache.set(_cache_key(name), (files, failed))
+
+
+def generate(name, author_id=None, group_id=None):
+    """Строит производные и сбрасывает кеш страниц, где их ещё нет.
+
+    Ошибка записывается в ImageDerivatives: лента такую картинку в
+    очередь больше не ставит.
+    """
+    try:
+        files = []
+        for width, image_format in DERIVATIVES:
+            thumbnail = default.backend.get_thumbnail(
+                name, geometry(width), format=image_format, **FEED_OPTIONS
+            )
+            # sorl не бросает исключение на битом исходнике, а лишь не
+            # записывает миниатюру в своё хранилище ключей
+            if default.kvstore.get(thumbnail) is None:
+                raise ValueError(f'sorl не построил {thumbnail.name}')
+            files.append((width, image_format, thumbnail.name, thumbnail.size))
+        _record(name, files=json.dumps(files))
+        invalidate('posts', *author_scopes(author_id), *group_scopes(group_id))
+    except Exception:
+        logger.exception('Не удалось построить производные %s', name)
+        _record(name, failed=True)
+    finally:
+        with _lock:
+            _pending.discard(name)
+        if _executor is not None:
+            close_old_connections()
+
+
+def schedule(post):
+    """Ставит построение производных в очередь (один раз на файл)."""
+    global _executor
+    name = post.image.name
+    if not name:
+        return
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    args = (name, post.author_id, post.group_id)
+    if not settings.THUMBNAIL_WORKERS:
+        generate(*args)
+        return
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails'
+            )
+    _executor.submit(generate, *args)
+
+
+def build_missing(posts, chunk_size=500, retry_failed=False):
+    """Синхронно строит недостающие наборы для постов; возвращает их число.
+
+    Готовность проверяется пачками по chunk_size постов; картинки с
+    записанной ошибкой повторяются только с retry_failed.
+    """
+    posts = iter(posts)
+    built = 0
+    while True:
+        chunk = [post for post in islice(posts, chunk_size) if post.image]
+        if not chunk:
+            return built
+        ready = cached_thumbnails(post.image for post in chunk)
+        for post in chunk:
+            derivatives = ready.get(post.image.name)
+            if derivatives is None or (derivatives.failed and retry_failed):
+                generate(post.image.name, post.author_id, post.group_id)
+                built += 1
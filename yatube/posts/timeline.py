@@ -0,0 +1,185 @@
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+
+from . import caching
+from .models import FeedEntry, Follow, Post, UserStats
+
+logger = logging.getLogger(__name__)
+
+# Аннотация, по которой сортируется и листается лента подписок
+FEED_DATE = 'feed_date'
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _create_entries(entries):
+    # Размер INSERT выбирает Django по ограничениям базы
+    FeedEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def is_celebrity(author_id):
+    """Посты автора с числом подписчиков не ниже порога не раздаются."""
+    threshold = settings.FOLLOW_FEED_CELEBRITY_THRESHOLD
+    if threshold is None:
+        return False
+    return UserStats.objects.filter(
+        user_id=author_id, followers_count__gte=threshold
+    ).exists()
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    fan_out_posts([post])
+
+
+def fan_out_posts(posts):
+    """Раскладывает новые посты; подписчики — один запрос на автора."""
+    by_author = defaultdict(list)
+    for post in posts:
+        by_author[post.author_id].append(post)
+    for author_id, author_posts in by_author.items():
+        if is_celebrity(author_id):
+            continue
+        followers = Follow.objects.filter(author_id=author_id).values_list(
+            'user_id', flat=True
+        )
+        _create_entries(
+            FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers.iterator()
+            for post in author_posts
+        )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    )
+    _create_entries(
+        FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for pk, pub_date in posts.iterator()
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося пользователя."""
+    FeedEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def fan_out_demoted(author_id):
+    """Раздаёт посты бывшей «звезды» всем её подписчикам."""
+    try:
+        followers = Follow.objects.filter(author_id=author_id).exclude(
+            user=None
+        ).values_list('user_id', flat=True)
+        for follower_id in followers.iterator():
+            backfill(follower_id, author_id)
+        # Раздача идёт после ответа, в пуле: ленты и их ETag, собранные
+        # до неё, устаревают только теперь
+        caching.invalidate(*caching.author_scopes(author_id))
+    except Exception:
+        logger.exception('Не удалось раздать посты автора %s', author_id)
+    finally:
+        if _executor is not None:
+            close_old_connections()
+
+
+def schedule_demoted(author_id):
+    """Ставит раздачу постов бывшей «звезды» в пул FOLLOW_FEED_WORKERS."""
+    global _executor
+    if not settings.FOLLOW_FEED_WORKERS:
+        fan_out_demoted(author_id)
+        return
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.FOLLOW_FEED_WORKERS,
+                thread_name_prefix='timelines'
+            )
+    _executor.submit(fan_out_demoted, author_id)
+
+
+def on_unfollow(user_id, author_id):
+    """Чистит ленту отписавшегося.
+
+    Если автор перестал быть «звездой», его посты раздаются оставшимся
+    подписчикам уже после ответа: в пуле потоков, после фиксации
+    отписки. До тех пор их ленты могут не содержать его постов.
+    """
+    prune(user_id, author_id)
+    threshold = settings.FOLLOW_FEED_CELEBRITY_THRESHOLD
+    if threshold is None:
+        return
+    dropped = UserStats.objects.filter(
+        user_id=author_id, followers_count=threshold - 1
+    ).exists()
+    if dropped:
+        transaction.on_commit(lambda: schedule_demoted(author_id))
+
+
+def rebuild_timelines():
+    """Собирает все ленты заново по текущим подпискам."""
+    with transaction.atomic():
+        FeedEntry.objects.all().delete()
+        follows = Follow.objects.exclude(user=None).values_list(
+            'user_id', 'author_id'
+        )
+        for user_id, author_id in follows.iterator():
+            backfill(user_id, author_id)
+
+
+def celebrity_authors(user):
+    """id авторов-«звёзд», на которых подписан user."""
+    threshold = settings.FOLLOW_FEED_CELEBRITY_THRESHOLD
+    if threshold is None:
+        return []
+    return list(Follow.objects.filter(
+        user=user, author__stats__followers_count__gte=threshold
+    ).values_list('author_id', flat=True))
+
+
+def by_feed_date(posts, date='pub_date'):
+    """Посты с датой date в аннотации FEED_DATE, новые первыми."""
+    return posts.annotate(**{FEED_DATE: F(date)}).order_by(
+        f'-{FEED_DATE}', '-pk'
+    )
+
+
+def follow_feed(user):
+    """Посты авторов, на которых подписан user, для follow_index.
+
+    Возвращает queryset и список потоков для курсорного слияния
+    (None, если лента читается одним запросом); листать их нужно по
+    FEED_DATE. Материализованная лента сортируется по дате из FeedEntry
+    и читается по индексу (user, pub_date). В гибридном режиме посты
+    «звёзд» не раздаются по лентам, а подмешиваются при чтении.
+    """
+    posts = Post.objects.for_feed()
+    if not settings.FOLLOW_FEED_FANOUT:
+        return by_feed_date(posts.filter(author__following__user=user)), None
+    timeline = by_feed_date(
+        posts.filter(feed_entries__user=user), 'feed_entries__pub_date'
+    )
+    celebrities = celebrity_authors(user)
+    if not celebrities:
+        return timeline, None
+    entries = FeedEntry.objects.filter(user=user).values('post_id')
+    merged = by_feed_date(posts.filter(
+        Q(pk__in=entries) | Q(author_id__in=celebrities)
+    ))
+    streams = [timeline] + [
+        by_feed_date(posts.filter(author_id=author_id))
+        for author_id in celebrities
+    ]
+    return merged, streams
@@ -0,0 +1,200 @@
+"""Потоковые импорт и экспорт постов в NDJSON и CSV.
+
+Запись поста: id, text, pub_date, updated, author (username),
+group (slug или пусто), image (имя файла в MEDIA_ROOT; сами файлы
+переносятся отдельно). Память не зависит от размера выгрузки: строки
+читаются и пишутся по одной, в базу уходят пачками.
+"""
+import csv
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import bulk, changelog, search, timeline
+from .caching import author_scopes, group_scopes, invalidate
+from .counters import recount_posts
+from .models import ChangeLog, Group, Post, User
+
+FIELDS = ('id', 'text', 'pub_date', 'updated', 'author', 'group', 'image')
+FORMATS = ('ndjson', 'csv')
+
+
+class RowError(ValueError):
+    pass
+
+
+def guess_format(path):
+    return 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+
+def export_rows(queryset, chunk_size=2000):
+    """Словари постов queryset по возрастанию id, без загрузки всех сразу."""
+    rows = queryset.order_by('pk').values_list(
+        'pk', 'text', 'pub_date', 'updated', 'author__username',
+        'group__slug', 'image'
+    ).iterator(chunk_size=chunk_size)
+    for pk, text, pub_date, updated, author, group, image in rows:
+        yield {
+            'id': pk,
+            'text': text,
+            'pub_date': pub_date.isoformat(),
+            'updated': updated.isoformat(),
+            'author': author,
+            'group': group or '',
+            'image': image or '',
+        }
+
+
+def write_rows(stream, rows, file_format):
+    """Пишет строки в текстовый поток; возвращает их число."""
+    count = 0
+    if file_format == 'csv':
+        writer = csv.DictWriter(stream, FIELDS)
+        writer.writeheader()
+        for count, row in enumerate(rows, 1):
+            writer.writerow(row)
+        return count
+    for count, row in enumerate(rows, 1):
+        stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+    return count
+
+
+def read_rows(stream, file_format):
+    """Пары (номер строки файла, словарь) из текстового потока."""
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            row = RowError(f'неверный JSON: {error}')
+        yield number, row
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _parse_date(value, default):
+    if not value:
+        return default
+    date = parse_datetime(value)
+    if date is None:
+        raise RowError(f'неверная дата {value!r}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def _parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RowError(f'неверный id {value!r}')
+
+
+class PostBuilder:
+    """Собирает посты одной пачки строк.
+
+    Авторы, группы и, с keep_ids, уже занятые id ищутся одним запросом
+    на пачку.
+    """
+
+    def __init__(self, rows, keep_ids=False):
+        self.keep_ids = keep_ids
+        self.now = timezone.now()
+        self.authors = dict(User.objects.filter(
+            username__in={str(row.get('author')) for row in rows}
+        ).values_list('username', 'pk'))
+        self.groups = dict(Group.objects.filter(
+            slug__in={str(row['group']) for row in rows if row.get('group')}
+        ).values_list('slug', 'pk'))
+        self.taken = set()
+        if keep_ids:
+            ids = set()
+            for row in rows:
+                try:
+                    ids.add(_parse_id(row.get('id')))
+                except RowError:
+                    pass
+            self.taken = set(Post.objects.filter(pk__in=ids).values_list(
+                'pk', flat=True
+            ))
+
+    def build(self, row):
+        """Пост из строки; при ошибке в данных — RowError."""
+        if not row.get('text'):
+            raise RowError('пустой текст')
+        author = str(row.get('author'))
+        if author not in self.authors:
+            raise RowError(f'нет автора {author!r}')
+        group = row.get('group') and str(row['group'])
+        if group and group not in self.groups:
+            raise RowError(f'нет группы {group!r}')
+        pk = None
+        if self.keep_ids:
+            pk = _parse_id(row.get('id'))
+            if pk in self.taken:
+                raise RowError(f'пост {pk} уже есть')
+            self.taken.add(pk)
+        pub_date = _parse_date(row.get('pub_date'), self.now)
+        return Post(
+            pk=pk,
+            text=row['text'],
+            pub_date=pub_date,
+            updated=_parse_date(row.get('updated'), pub_date),
+            author_id=self.authors[author],
+            group_id=self.groups.get(group),
+            image=row.get('image') or '',
+        )
+
+
+def build_posts(chunk, keep_ids=False):
+    """Посты для bulk_create из пачки (номер, строка) и ошибки по строкам."""
+    errors = [
+        (number, str(row)) for number, row in chunk
+        if not isinstance(row, dict)
+    ]
+    rows = [(number, row) for number, row in chunk if isinstance(row, dict)]
+    builder = PostBuilder([row for _, row in rows], keep_ids)
+    posts = []
+    for number, row in rows:
+        try:
+            posts.append(builder.build(row))
+        except RowError as error:
+            errors.append((number, str(error)))
+    return posts, sorted(errors)
+
+
+def save_posts(posts):
+    """Записывает пачку постов вместе с тем, что делают их сигналы.
+
+    bulk_create сигналов не шлёт: счётчики, ленты подписок, поисковый
+    индекс, журнал изменений и кеш обновляются здесь и только для
+    авторов, групп и постов пачки. Вызывается в транзакции.
+    """
+    if not posts:
+        return
+    # Дата публикации — из файла; updated auto_now не ставит
+    bulk.bulk_create(Post, posts, keep_dates=['pub_date'])
+    authors = {post.author_id for post in posts}
+    groups = {post.group_id for post in posts} - {None}
+    recount_posts(authors, groups)
+    if settings.FOLLOW_FEED_FANOUT:
+        timeline.fan_out_posts(posts)
+    search.index_new_posts(posts)
+    changelog.record_many(posts, ChangeLog.CREATE)
+    invalidate('posts', *author_scopes(*authors), *group_scopes(*groups))
@@ -0,0 +1,84 @@
+"""Приём загружаемых картинок без чтения их целиком в память."""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadhandler import (
+    StopUpload, TemporaryFileUploadHandler
+)
+from PIL import Image
+
+DRAFT_SIZE = (256, 256)
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл, но не больше POST_IMAGE_MAX_SIZE.
+
+    На первом байте сверх лимита разбор запроса обрывается: остаток тела
+    не читается, а файлы из request.FILES пропадают. Имя поля остаётся в
+    request.oversized_uploads, чтобы форма объяснила отказ.
+    """
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.POST_IMAGE_MAX_SIZE:
+            if self.request is not None:
+                self.request.oversized_uploads = (
+                    oversized_uploads(self.request) | {self.field_name}
+                )
+            raise StopUpload(connection_reset=True)
+        return super().receive_data_chunk(raw_data, start)
+
+
+def oversized_uploads(request):
+    """Поля запроса, загрузки в которых оборвались на лимите размера."""
+    return getattr(request, 'oversized_uploads', frozenset())
+
+
+def size_error():
+    return ValidationError(
+        'Файл больше %(limit)s МБ.',
+        code='file_too_large',
+        params={'limit': settings.POST_IMAGE_MAX_SIZE // 2 ** 20}
+    )
+
+
+def validate_size(upload):
+    if upload.size > settings.POST_IMAGE_MAX_SIZE:
+        raise size_error()
+
+
+def validate_image(upload):
+    """Проверяет загрузку, уже прошедшую ImageField, не раскрывая её.
+
+    Размер и число пикселей сверяются до декодирования — по загрузке
+    и заголовку. Декодируется только JPEG, и то в режиме draft, сразу в
+    уменьшенном масштабе; у остальных форматов verify() проверяет
+    структуру файла без распаковки пикселей.
+    """
+    validate_size(upload)
+    width, height = upload.image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка больше %(limit)s мегапикселей.',
+            code='too_many_pixels',
+            params={'limit': settings.POST_IMAGE_MAX_PIXELS // 10 ** 6}
+        )
+    if hasattr(upload, 'temporary_file_path'):
+        source = upload.temporary_file_path()
+    else:
+        upload.seek(0)
+        source = upload
+    try:
+        with Image.open(source) as image:
+            if image.format == 'JPEG':
+                image.draft('RGB', DRAFT_SIZE)
+                image.load()
+            else:
+                # load() распаковал бы PNG или GIF целиком: до
+                # POST_IMAGE_MAX_PIXELS * 4 байт памяти на запрос
+                image.verify()
+    except Exception as exc:
+        raise ValidationError(
+            'Файл повреждён или не является изображением.',
+            code='invalid_image'
+        ) from exc
+    finally:
+        upload.seek(0)
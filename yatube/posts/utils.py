@@ -0,0 +1,87 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.urls import reverse
+
+from . import write_queue
+from .models import Comment
+from .paginators import (
+    NEXT, CursorPaginator, MergingCursorPaginator, encode_cursor
+)
+from .thumbnails import cached_thumbnails
+
+
+def get_page_obj(request, queryset, streams=None, date_field='pub_date'):
+    """Страница ленты в режиме, выбранном settings.FEED_PAGINATION.
+
+    streams — необязательный список querysets, который курсорный режим
+    сливает вместо одного queryset; date_field — поле курсора.
+    """
+    if settings.FEED_PAGINATION == 'cursor':
+        if streams:
+            paginator = MergingCursorPaginator(
+                streams, settings.P_ON_PAGE, date_field=date_field
+            )
+        else:
+            paginator = CursorPaginator(
+                queryset, settings.P_ON_PAGE, date_field=date_field
+            )
+        return paginator.get_page(request.GET.get('cursor'))
+    paginator = Paginator(queryset, settings.P_ON_PAGE)
+    return paginator.get_page(request.GET.get('page'))
+
+
+def page_thumbnails(page_obj):
+    """Миниатюры всех постов страницы одним пакетным запросом."""
+    return cached_thumbnails(post.image for post in page_obj)
+
+
+def comments_paginator(comments):
+    return CursorPaginator(
+        comments, settings.COMMENTS_ON_PAGE, date_field='created',
+        ascending=True
+    )
+
+
+def comments_url(post, comment=None):
+    """Адрес страницы комментариев, которая заканчивается comment.
+
+    Без comment — последняя страница: в её конце автор видит и свои
+    комментарии из очереди отложенной записи.
+    """
+    comments = Comment.objects.filter(post=post).order_by('-created', '-pk')
+    skip = settings.COMMENTS_ON_PAGE
+    anchor = '#comments'
+    if comment is not None:
+        paginator = comments_paginator(comments)
+        comments = comments.filter(
+            paginator.before(paginator.position(comment))
+        )
+        skip -= 1
+        anchor = f'#comment-{comment.pk}'
+    url = reverse('posts:post_detail', args=(post.pk,))
+    # Страница начинается сразу после этого комментария
+    boundary = list(comments.values_list('created', 'pk')[skip:skip + 1])
+    if boundary:
+        url += '?' + urlencode({'cursor': encode_cursor(NEXT, boundary[0])})
+    return url + anchor
+
+
+def get_comments_page(request, post):
+    """Страница комментариев поста, от старых к новым, по ?cursor=.
+
+    Читает индекс (post, created) и не больше COMMENTS_ON_PAGE + 1 строк,
+    автор приходит тем же запросом.
+    """
+    comments = Comment.objects.filter(post=post).select_related(
+        'author'
+    ).only(
+        'post', 'text', 'created', 'author__username', 'author__first_name',
+        'author__last_name'
+    )
+    page = comments_paginator(comments).get_page(request.GET.get('cursor'))
+    if not page.has_next():
+        # Свои комментарии из очереди автор видит сразу, в конце списка
+        page.object_list += write_queue.pending_comments(request, post)
+    return page
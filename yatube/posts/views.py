@@ -1,103 +1,175 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Max
 from django.shortcuts import render, redirect, get_object_or_404
-from django.views.decorators.cache import cache_page
 
+from core.db_routers import pin_to_primary, read_from_replicas
+
+from . import write_queue
 from .models import Group, Post, User, Follow
-from yatube.settings import P_ON_PAGE, CACHE_TIME
+from .caching import cache_feed, conditional, get_generations
+from .counters import get_user_stats
 from .forms import PostForm, CommentForm
+from .search import find_posts
+from .timeline import FEED_DATE, follow_feed
+from .uploads import oversized_uploads
+from .utils import (
+    comments_url, get_comments_page, get_page_obj, page_thumbnails
+)
 
 
-@cache_page(CACHE_TIME)
+@cache_feed(lambda: ['posts'])
+@read_from_replicas
 def index(request):
     """Главная страница"""
 
     title = 'Последние обновления на сайте'
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, P_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    page_obj = get_page_obj(request, post_list)
     context = {
         'title': title,
         'page_obj': page_obj,
+        'thumbnails': page_thumbnails(page_obj),
     }
     return render(request, 'posts/index.html', context)
 
 
+@cache_feed(lambda slug: [f'group:{slug}'])
+@read_from_replicas
 def group_posts(request, slug):
     """Посты группы"""
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, P_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = group.posts.for_feed()
+    page_obj = get_page_obj(request, post_list)
     context = {
         'group': group,
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'thumbnails': page_thumbnails(page_obj)
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@cache_feed(lambda username: [f'author:{username}'])
+@read_from_replicas
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    paginator = Paginator(posts, P_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    posts_count = posts.count()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    posts = author.posts.for_feed()
+    page_obj = get_page_obj(request, posts)
+    posts_count = get_user_stats(author).posts_count
     if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user,
-            author=author
-        ).exists()
+        following = write_queue.pending_follows(request).get(author.pk)
+        if following is None:
+            following = Follow.objects.filter(
+                user=request.user,
+                author=author
+            ).exists()
     else:
         following = False
     context = {
         'author': author,
         'posts_count': posts_count,
         'page_obj': page_obj,
+        'thumbnails': page_thumbnails(page_obj),
         'following': following
     }
     return render(request, 'posts/profile.html', context)
 
 
+@read_from_replicas
+def search(request):
+    """Поиск по тексту постов"""
+    query = request.GET.get('q', '').strip()
+    results = find_posts(query)
+    page_obj = None
+    if results is not None:
+        paginator = Paginator(results, settings.P_ON_PAGE)
+        page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+        'thumbnails': page_obj and page_thumbnails(page_obj),
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def post_validators(request, post_id):
+    """Версия поста, его комментариев и автора одним запросом."""
+    row = Post.objects.filter(pk=post_id).annotate(
+        last_comment=Max('comments__created')
+    ).values_list(
+        'updated', 'last_comment', 'comments_count', 'author__username',
+        'author__first_name', 'author__last_name', 'group__title'
+    ).order_by('pk').first()
+    if row is None:
+        return None
+    # Поколение автора сдвигают его новые посты и готовые миниатюры
+    generations = get_generations([f'author:{row[3]}'])
+    # Без Last-Modified: удаление комментария, правка автора или группы
+    # не сдвигают ни одну дату, и сверять можно только ETag
+    return (row, generations), None
+
+
+@read_from_replicas
+@conditional(post_validators)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    if request.method == 'POST':
+        # Комментарии принимает add_comment
+        return add_comment(request, post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id
+    )
     author = post.author
-    author_posts_count = author.posts.count()
+    author_posts_count = get_user_stats(author).posts_count
     title = post.text
-    form = CommentForm(request.POST or None)
-    if form.is_valid():
-        form.save()
-        return redirect(
-            'posts:post_detail', id=post_id
-        )
-    comments = post.comments.all()
+    form = CommentForm()
     context = {
         'title': title,
         'post': post,
         'author_posts_count': author_posts_count,
-        'comments': comments,
+        'comments': get_comments_page(request, post),
         'form': form
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@read_from_replicas
+@conditional(post_validators)
+def post_comments(request, post_id):
+    """Следующая страница комментариев — фрагмент HTML для «Ещё»."""
+    post = get_object_or_404(Post.objects.only('pk'), id=post_id)
+    context = {
+        'post': post,
+        'comments': get_comments_page(request, post),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
+@pin_to_primary
+@transaction.atomic
 def post_create(request):
     form = PostForm(
         request.POST or None,
-        files=request.FILES or None
+        files=request.FILES or None,
+        oversized=oversized_uploads(request)
     )
     if form.is_valid():
-        post = form.save(commit=False)
-        post.author = request.user
-        post.save()
+        form.instance.author = request.user
+        post = form.save()
         return redirect('posts:profile', username=post.author.username)
     return render(request, 'posts/create_post.html', {'form': form})
 
 
 @login_required
+@pin_to_primary
+@transaction.atomic
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     if request.user != post.author:
@@ -105,7 +177,8 @@ def post_edit(request, post_id):
     form = PostForm(
         request.POST,
         files=request.FILES or None,
-        instance=post
+        instance=post,
+        oversized=oversized_uploads(request)
     )
     if form.is_valid():
         form.save()
@@ -118,39 +191,77 @@ def post_edit(request, post_id):
 
 
 @login_required
+@pin_to_primary
 def add_comment(request, post_id):
+    # Без transaction.atomic: очередь — отдельный файл, и откат базы
+    # не отменил бы уже записанное в неё действие
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
-    if form.is_valid():
+    if form.is_valid() and settings.WRITE_BEHIND:
+        write_queue.enqueue(
+            request.user.pk, write_queue.COMMENT, post.pk,
+            form.cleaned_data['text']
+        )
+    elif form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
-    return redirect('posts:post_detail', post_id=post_id)
+        with transaction.atomic():
+            comment.save()
+        return redirect(comments_url(post, comment))
+    return redirect(comments_url(post))
+
+
+def follow_validators(request):
+    """Поколения всех авторов, на которых подписан пользователь."""
+    usernames = Follow.objects.filter(user=request.user).values_list(
+        'author__username', flat=True
+    )
+    generations = get_generations(
+        [f'author:{username}' for username in usernames]
+    )
+    return sorted(generations.items()), None
 
 
 @login_required
+@read_from_replicas
+@conditional(follow_validators)
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, P_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts, streams = write_queue.with_pending_follows(
+        request, *follow_feed(request.user)
+    )
+    page_obj = get_page_obj(request, posts, streams, date_field=FEED_DATE)
     context = {
         'page_obj': page_obj,
+        'thumbnails': page_thumbnails(page_obj),
     }
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@pin_to_primary
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        if settings.WRITE_BEHIND:
+            write_queue.enqueue(
+                request.user.pk, write_queue.FOLLOW, author.pk
+            )
+        else:
+            with transaction.atomic():
+                Follow.objects.get_or_create(
+                    user=request.user, author=author
+                )
     return redirect('posts:profile', username=username)
 
 
 @login_required
+@pin_to_primary
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
+    if settings.WRITE_BEHIND:
+        write_queue.enqueue(request.user.pk, write_queue.UNFOLLOW, author.pk)
+    else:
+        with transaction.atomic():
+            Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username=username)
@@ -0,0 +1,239 @@
+"""Отложенная запись комментариев и подписок (WRITE_BEHIND).
+
+add_comment, profile_follow и profile_unfollow не пишут в основную базу,
+а дописывают действие в очередь — отдельный файл SQLite WRITE_QUEUE_PATH
+со своей блокировкой записи. manage.py apply_write_queue применяет
+очередь пачками: bulk_create и одно удаление на пачку в одной
+транзакции. Номер последнего применённого действия хранится в
+ConsumerOffset в той же транзакции, поэтому после сбоя действия не
+применяются дважды. Позиция привязана к идентификатору файла очереди:
+новый файл начинает отсчёт заново.
+
+Пока действие пользователя лежит в очереди, он сам видит его результат:
+страницы, которых оно касается, собираются с поправкой на очередь и
+минуют кеш.
+"""
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+
+from . import bulk, timeline
+from .models import Comment, ConsumerOffset, Follow, Post, User
+
+COMMENT, FOLLOW, UNFOLLOW = 'comment', 'follow', 'unfollow'
+
+_local = threading.local()
+
+
+def _queue():
+    """Соединение с файлом очереди, своё в каждом потоке."""
+    path = settings.WRITE_QUEUE_PATH
+    queues = getattr(_local, 'queues', None)
+    if queues is None:
+        queues = _local.queues = {}
+    if path not in queues:
+        db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        db.execute('PRAGMA journal_mode = wal')
+        # Ответ пользователю уходит только после fsync действия
+        db.execute('PRAGMA synchronous = full')
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS writes ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, '
+            'action TEXT NOT NULL, target_id INTEGER NOT NULL, text TEXT, '
+            'created REAL NOT NULL)'
+        )
+        db.execute(
+            'CREATE INDEX IF NOT EXISTS writes_user_idx ON writes (user_id)'
+        )
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS meta '
+            '(key TEXT PRIMARY KEY, value TEXT)'
+        )
+        db.execute(
+            "INSERT OR IGNORE INTO meta VALUES ('queue_id', ?)",
+            [uuid.uuid4().hex]
+        )
+        queues[path] = db
+    return queues[path]
+
+
+def _offset_name(queue):
+    queue_id, = queue.execute(
+        "SELECT value FROM meta WHERE key = 'queue_id'"
+    ).fetchone()
+    return f'write-queue:{queue_id}'
+
+
+def close():
+    """Закрывает соединения потока с очередью."""
+    for db in getattr(_local, 'queues', {}).values():
+        db.close()
+    _local.queues = {}
+
+
+def enqueue(user_id, action, target_id, text=None):
+    """Дописывает действие пользователя в очередь."""
+    _queue().execute(
+        'INSERT INTO writes (user_id, action, target_id, text, created) '
+        'VALUES (?, ?, ?, ?, ?)',
+        [user_id, action, target_id, text, time.time()]
+    )
+
+
+def pending(request):
+    """Неприменённые действия текущего пользователя, по порядку.
+
+    Читаются один раз за запрос; без WRITE_BEHIND и для анонима — пусто.
+    """
+    if not hasattr(request, '_pending_writes'):
+        request._pending_writes = []
+        if settings.WRITE_BEHIND and request.user.is_authenticated:
+            request._pending_writes = _queue().execute(
+                'SELECT action, target_id, text, created FROM writes '
+                'WHERE user_id = ? ORDER BY id',
+                [request.user.pk]
+            ).fetchall()
+    return request._pending_writes
+
+
+def _date(timestamp):
+    return datetime.fromtimestamp(timestamp, dt_timezone.utc)
+
+
+def pending_comments(request, post):
+    """Ещё не записанные комментарии пользователя к post."""
+    return [
+        Comment(
+            post=post, author=request.user, text=text,
+            created=_date(created)
+        )
+        for action, target_id, text, created in pending(request)
+        if action == COMMENT and target_id == post.pk
+    ]
+
+
+def pending_follows(request):
+    """{id автора: подписан ли} по последнему действию из очереди."""
+    return {
+        target_id: action == FOLLOW
+        for action, target_id, _, _ in pending(request)
+        if action in (FOLLOW, UNFOLLOW)
+    }
+
+
+def with_pending_follows(request, posts, streams):
+    """Лента подписок с поправкой на (от)подписки из очереди."""
+    follows = pending_follows(request)
+    if not follows:
+        return posts, streams
+    followed = [author for author, state in follows.items() if state]
+    unfollowed = [author for author, state in follows.items() if not state]
+    posts = Post.objects.for_feed().filter(
+        Q(pk__in=posts.values('pk')) | Q(author_id__in=followed)
+    ).exclude(author_id__in=unfollowed)
+    return timeline.by_feed_date(posts), None
+
+
+def _bulk_create(model, objects, keep_dates=()):
+    """bulk_create с id у объектов и post_save для каждого.
+
+    Сигналы двигают счётчики, ленты, журнал изменений и кеш так же, как
+    при обычном save().
+    """
+    created = bulk.bulk_create(model, objects, keep_dates)
+    using = router.db_for_write(model)
+    for instance in created:
+        post_save.send(
+            sender=model, instance=instance, created=True,
+            update_fields=None, raw=False, using=using
+        )
+    return created
+
+
+def _existing(model, ids):
+    return set(
+        model.objects.filter(pk__in=ids).values_list('pk', flat=True)
+    )
+
+
+def _apply_comments(rows):
+    # Пост или автора могли удалить, пока комментарий ждал в очереди
+    post_ids = _existing(Post, {row[2] for row in rows})
+    user_ids = _existing(User, {row[0] for row in rows})
+    # Время комментария — время действия, а не применения очереди
+    _bulk_create(Comment, [
+        Comment(
+            post_id=target_id, author_id=user_id, text=text,
+            created=_date(created)
+        )
+        for user_id, _, target_id, text, created in rows
+        if target_id in post_ids and user_id in user_ids
+    ], keep_dates=['created'])
+
+
+def _apply_follows(rows):
+    user_ids = _existing(
+        User, {row[0] for row in rows} | {row[2] for row in rows}
+    )
+    wanted = {}
+    for user_id, action, author_id, *_ in rows:
+        if user_id != author_id and {user_id, author_id} <= user_ids:
+            wanted[user_id, author_id] = action == FOLLOW
+    existing = {
+        (user_id, author_id): pk
+        for pk, user_id, author_id in Follow.objects.filter(
+            user_id__in={user_id for user_id, _ in wanted},
+            author_id__in={author_id for _, author_id in wanted},
+        ).values_list('pk', 'user_id', 'author_id')
+    }
+    _bulk_create(Follow, [
+        Follow(user_id=user_id, author_id=author_id)
+        for (user_id, author_id), follow in wanted.items()
+        if follow and (user_id, author_id) not in existing
+    ])
+    stale = [
+        existing[pair] for pair, follow in wanted.items()
+        if not follow and pair in existing
+    ]
+    if stale:
+        # Удаление одним запросом; post_delete Django шлёт сам
+        Follow.objects.filter(pk__in=stale).delete()
+
+
+def apply_batch(limit=None):
+    """Применяет пачку действий из очереди; возвращает их число."""
+    queue = _queue()
+    with transaction.atomic():
+        offset, _ = ConsumerOffset.objects.select_for_update().get_or_create(
+            name=_offset_name(queue)
+        )
+        rows = queue.execute(
+            'SELECT id, user_id, action, target_id, text, created '
+            'FROM writes '
+            'WHERE id > ? ORDER BY id LIMIT ?',
+            [offset.position, limit or settings.WRITE_QUEUE_BATCH_SIZE]
+        ).fetchall()
+        if rows:
+            _apply_comments([row[1:] for row in rows if row[2] == COMMENT])
+            _apply_follows([row[1:] for row in rows if row[2] != COMMENT])
+            offset.position = rows[-1][0]
+            offset.save()
+    queue.execute('DELETE FROM writes WHERE id <= ?', [offset.position])
+    return len(rows)
+
+
+def apply_all():
+    """Применяет всю очередь; возвращает число действий."""
+    total = 0
+    while True:
+        applied = apply_batch()
+        if not applied:
+            return total
+        total += applied
@@ -9,28 +9,35 @@ from django.contrib.auth.views import (
     PasswordResetCompleteView
 )
 from django.urls import path
+
+from core.db_routers import pin_to_primary
+
 from . import views
 
 
 app_name = 'users'
 
 urlpatterns = [
-    path('signup/', views.SignUp.as_view(), name='signup'),
+    # Следующий запрос после входа, регистрации или смены пароля должен
+    # читать пользователя из основной базы, а не из отстающей реплики
+    path('signup/', pin_to_primary(views.SignUp.as_view()), name='signup'),
     path(
         'logout/',
-        LogoutView.as_view(template_name='users/logged_out.html'),
+        pin_to_primary(
+            LogoutView.as_view(template_name='users/logged_out.html')
+        ),
         name='logout'
     ),
     path(
         'login/',
-        LoginView.as_view(template_name='users/login.html'),
+        pin_to_primary(LoginView.as_view(template_name='users/login.html')),
         name='login'
     ),
     path(
         'password_change/',
-        PasswordChangeView.as_view(
+        pin_to_primary(PasswordChangeView.as_view(
             template_name='users/password_change_form.html'
-        ),
+        )),
         name='password_change_form'
     ),
     path(
@@ -56,9 +63,9 @@ urlpatterns = [
     ),
     path(
         'reset/<uidb64>/<token>/',
-        PasswordResetConfirmView.as_view(
+        pin_to_primary(PasswordResetConfirmView.as_view(
             template_name='users/password_reset_confirm.html'
-        ),
+        )),
         name='password_reset_confirm'
     ),
     path(
@@ -0,0 +1,37 @@
+"""Разбор CACHE_URL в настройку CACHES['default'].
+
+Поддерживаемые схемы:
+    locmem://[имя]                  — память процесса (по умолчанию)
+    file:///абсолютный/путь         — общий для процессов файловый кеш
+    memcached://host:port[,host:port] — нужен python-memcached
+    redis://[:пароль@]host:port/db  — нужен django-redis
+"""
+from urllib.parse import urlsplit
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+    'redis': 'django_redis.cache.RedisCache',
+    'rediss': 'django_redis.cache.RedisCache',
+}
+
+
+def parse_cache_url(url, key_prefix='', version=1):
+    parts = urlsplit(url)
+    if parts.scheme not in BACKENDS:
+        raise ValueError(f'Неизвестная схема кеша: {url!r}')
+    config = {
+        'BACKEND': BACKENDS[parts.scheme],
+        'KEY_PREFIX': key_prefix,
+        'VERSION': int(version),
+    }
+    if parts.scheme == 'locmem':
+        config['LOCATION'] = parts.netloc
+    elif parts.scheme == 'file':
+        config['LOCATION'] = parts.path
+    elif parts.scheme == 'memcached':
+        config['LOCATION'] = parts.netloc.split(',')
+    else:
+        config['LOCATION'] = url
+    return config
@@ -11,6 +11,9 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import sys
+
+from .cache_url import parse_cache_url
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -50,6 +53,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,7 +69,8 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backend.TimedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -88,9 +94,30 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'NAME': os.getenv(
+            'DATABASE_PATH', os.path.join(BASE_DIR, 'db.sqlite3')
+        ),
     }
 }
+# Реплики только для чтения: пути к файлам SQLite через запятую
+# (наполняются командой sync_replicas), в тестах они смотрят в default
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+    filter(None, os.getenv('DATABASE_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica_{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{number}')
+DATABASE_ROUTERS = ['core.db_routers.ReplicaRouter']
+# PRAGMA, выполняемые на каждом новом соединении с SQLite (core.sqlite);
+# настроенный набор — в yatube.settings_production
+SQLITE_PRAGMAS = {}
+# Насколько реплики могут отставать: столько после записи пользователь
+# читает из default и столько кешируются страницы, собранные по реплике
+REPLICA_MAX_LAG_SECONDS = 10
 
 
 # Password validation
@@ -131,8 +158,60 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+# Отдавать STATIC_ROOT через core.views.serve_static (когда перед
+# приложением нет веб-сервера, который делает это сам)
+SERVE_STATIC = False
+# Хешированные имена статики неизменны — кешируются на год
+STATIC_HASHED_MAX_AGE = 60 * 60 * 24 * 365
+# Файлы, для которых collectstatic пишет .gz и .br копии
+STATIC_COMPRESS_EXTENSIONS = (
+    '.css', '.js', '.svg', '.ico', '.json', '.map', '.txt', '.xml',
+)
+
+# core.middleware.CompressionMiddleware сжимает ответы этих типов,
+# если они не короче COMPRESS_MIN_SIZE байт
+COMPRESS_CONTENT_TYPES = (
+    'text/html', 'text/plain', 'text/css', 'application/json',
+    'application/javascript', 'image/svg+xml',
+)
+COMPRESS_MIN_SIZE = 1024
 
 P_ON_PAGE = 10
+# Комментарии под постом подгружаются страницами по столько
+COMMENTS_ON_PAGE = 20
+# 'page' — классический Paginator (?page=N),
+# 'cursor' — keyset-пагинация без COUNT (?cursor=<токен>)
+FEED_PAGINATION = 'page'
+# Лента подписок из материализованной таблицы FeedEntry
+# (после включения выполнить manage.py rebuild_timelines)
+FOLLOW_FEED_FANOUT = False
+# Посты авторов с таким числом подписчиков не раздаются по лентам,
+# а подмешиваются при чтении (None — раздавать всем)
+FOLLOW_FEED_CELEBRITY_THRESHOLD = None
+# Потоки, в которых посты автора, опустившегося ниже порога, раздаются
+# подписчикам после отписки (0 — сразу после фиксации, в том же запросе)
+FOLLOW_FEED_WORKERS = int(os.getenv('FOLLOW_FEED_WORKERS', 1))
+# Индекс поиска: 'fts5' — SQLite FTS5, 'python' — таблица SearchTerm,
+# 'auto' — FTS5, если он доступен (после смены — rebuild_search_index)
+POST_SEARCH_BACKEND = 'auto'
+# Потребители журнала изменений (подклассы posts.changelog.Consumer),
+# которых запускает manage.py consume_changes, например
+# posts.changelog.LoggingConsumer. Пустой список отключает журнал
+CHANGE_LOG_CONSUMERS = list(
+    filter(None, os.getenv('CHANGE_LOG_CONSUMERS', '').split(','))
+)
+# Не отдавать потребителям записи моложе стольких секунд: на базах с
+# параллельными транзакциями запись с меньшим id может появиться позже
+CHANGE_LOG_SETTLE_SECONDS = 0
+
+# Отложенная запись: комментарии и (от)подписки ложатся в очередь
+# WRITE_QUEUE_PATH, а в базу их пачками пишет manage.py apply_write_queue
+WRITE_BEHIND = os.getenv('WRITE_BEHIND', '') == '1'
+WRITE_QUEUE_PATH = os.getenv(
+    'WRITE_QUEUE_PATH', os.path.join(BASE_DIR, 'write_queue.sqlite3')
+)
+WRITE_QUEUE_BATCH_SIZE = 500
 
 
 LOGIN_URL = 'users:login'
@@ -146,14 +225,35 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Сколько последних замеров на каждый view хранит core.metrics
+REQUEST_METRICS_WINDOW = 1000
+
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-
-
+# Загрузки сразу пишутся во временные файлы, а не в память;
+# на байтах сверх POST_IMAGE_MAX_SIZE разбор запроса обрывается
+FILE_UPLOAD_HANDLERS = ['posts.uploads.LimitedTemporaryFileUploadHandler']
+POST_IMAGE_MAX_SIZE = 10 * 2 ** 20
+POST_IMAGE_MAX_PIXELS = 40 * 10 ** 6
+# Потоки, в которых posts.thumbnails заранее строит миниатюры;
+# 0 — строить прямо в запросе, сохранившем пост (ленты тогда их не строят).
+# В тестах пул по умолчанию выключен: его потоки не должны писать в тестовую
+# базу, пока тест её откатывает или очищает
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 0 if TESTING else 2))
+
+
+# Общий для всех воркеров кеш выбирается переменной окружения,
+# например CACHE_URL=file:///var/tmp/yatube или redis://127.0.0.1:6379/1
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    'default': parse_cache_url(
+        os.getenv('CACHE_URL', 'locmem://'),
+        key_prefix=os.getenv('CACHE_KEY_PREFIX', 'yatube'),
+        version=os.getenv('CACHE_VERSION', 1),
+    )
 }
-CACHE_TIME = 20
+# Ленты кешируются надолго: записи сдвигают поколения в posts.caching
+FEED_CACHE_TIME = 60 * 60 * 24
+# Карточка поста кешируется фрагментом; ключ меняется при правке поста
+POST_CARD_CACHE_TIME = 60 * 60 * 24
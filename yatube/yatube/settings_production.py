@@ -0,0 +1,36 @@
+"""Профиль для боевого запуска на SQLite.
+
+DJANGO_SETTINGS_MODULE=yatube.settings_production. Соединения
+переиспользуются между запросами, а журнал WAL позволяет читать
+во время записи. Сравнить с настройками по умолчанию:
+manage.py benchmark_sqlite.
+"""
+import os
+
+from core.sqlite import (
+    PRODUCTION_CONN_MAX_AGE, PRODUCTION_PRAGMAS, PRODUCTION_TIMEOUT
+)
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES as BASE_DATABASES
+
+DEBUG = False
+ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
+
+# Своя копия: словарь из yatube.settings не меняется
+DATABASES = {
+    alias: {
+        **database,
+        'CONN_MAX_AGE': PRODUCTION_CONN_MAX_AGE,
+        'OPTIONS': {
+            **database.get('OPTIONS', {}), 'timeout': PRODUCTION_TIMEOUT
+        },
+    }
+    for alias, database in BASE_DATABASES.items()
+}
+
+SQLITE_PRAGMAS = PRODUCTION_PRAGMAS
+
+# Хешированные имена и заранее сжатые копии статики
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+SERVE_STATIC = os.getenv('SERVE_STATIC', '1') == '1'